@@ -1,110 +1,110 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, g, jsonify
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, g, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 from datetime import datetime, timedelta
 import json
-import random
-import string
+import logging
+import math
 from functools import wraps
-from flask_migrate import Migrate
-from dotenv import load_dotenv
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
+import click
 import re
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Initialize Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev_secret_key_baba_milk_very_secret_and_long")
-app.config['SESSION_COOKIE_NAME'] = 'baba_session'
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
-app.config['SESSION_PERMANENT'] = True
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
-
-# Database Configuration
-db_url = os.environ.get("DATABASE_URL", "sqlite:///baba_milk.db")
-if db_url.startswith("postgres://"):
-    db_url = db_url.replace("postgres://", "postgresql://")
-app.config['SQLALCHEMY_DATABASE_URI'] = db_url
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-
-# Twilio Configuration
-TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
-TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
-TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN else None
-
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    phone = db.Column(db.String(20), unique=True, nullable=False)
-    password = db.Column(db.String(255), nullable=False)  # ✅ Add this line
-    is_admin = db.Column(db.Boolean, default=False)
-    address = db.Column(db.String(200), nullable=True)
-    orders = db.relationship('Order', backref='customer', lazy=True)
-
-class Product(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    category = db.Column(db.String(50), nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    image_path = db.Column(db.String(100), nullable=True)
-    description = db.Column(db.Text, nullable=True)
-
-class CartItem(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
-    quantity = db.Column(db.Integer, default=1)
-    user = db.relationship('User', backref='cart_items')
-    product = db.relationship('Product')
-    __table_args__ = (db.UniqueConstraint('user_id', 'product_id', name='_user_product_uc'),)
-
-class Order(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    order_date = db.Column(db.DateTime, default=datetime.utcnow)
-    total_amount = db.Column(db.Float, nullable=False)
-    delivery_address = db.Column(db.String(255), nullable=False)
-    delivery_phone = db.Column(db.String(20), nullable=False)
-    payment_method = db.Column(db.String(50), nullable=False)
-    payment_details = db.Column(db.JSON, nullable=True)
-    status = db.Column(db.String(50), default='placed')
-
-    @property
-    def items(self):
-        return ", ".join(f"{item.product.name} (x{item.quantity})" for item in self.order_items)
-
-    @property
-    def date(self):
-        return self.order_date.strftime('%Y-%m-%d %H:%M')
-
-    @property
-    def tracker_statuses(self):
-        return ['placed', 'confirmed', 'packed', 'out_for_delivery', 'delivered']
-
-    @property
-    def current_status_index(self):
-        try:
-            return self.tracker_statuses.index(self.status)
-        except ValueError:
-            return -1
-
-class OrderItem(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    price_at_purchase = db.Column(db.Float, nullable=False)
-    order = db.relationship('Order', backref='order_items')
-    product = db.relationship('Product')
+import secrets
+import sms
+import catalog
+from ratelimit import limiter, phone_key, otp_challenge_key, ip_key
+import otp as otp_store
+from compression import compress
+import events
+import order_status
+import archive
+import cart_merge
+from order_status import status_label
+from events import order_events
+from dbrouting import db_router, REPLICA_BIND
+from structured_logging import structured_logging
+from runtime import runtime
+from werkzeug.middleware.proxy_fix import ProxyFix
+from models import db, User, Product, CartItem, Order, OrderItem, ORDER_STATUSES, format_items_summary
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+log = logging.getLogger('baba.app')
+MAX_PRODUCTS_PER_PAGE = 100
+
+def load_env():
+    # python-dotenv is only needed for local development with a .env file
+    env_path = os.path.join(BASE_DIR, '.env')
+    if os.path.exists(env_path):
+        from dotenv import load_dotenv
+        load_dotenv(env_path)
+
+def init_migrate(app):
+    # Alembic is heavy to import and only needed by the `flask db` commands
+    from flask_migrate import Migrate
+    Migrate(app, db)
+
+def normalize_db_url(url):
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://")
+    return url
+
+def create_app():
+    load_env()
+
+    # Initialize Flask app
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev_secret_key_baba_milk_very_secret_and_long")
+    app.config['SESSION_COOKIE_NAME'] = 'baba_session'
+    app.config['SESSION_COOKIE_HTTPONLY'] = True
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
+    app.config['SESSION_PERMANENT'] = True
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
+
+    # JSON logs written to stdout from a background thread, with request ids and redaction
+    app.config['LOG_LEVEL'] = os.environ.get("LOG_LEVEL", "INFO").upper()
+    app.config['LOG_DEBUG_SAMPLE_RATE'] = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+    structured_logging.init_app(app)
+
+    # In-flight request counters for /debug/runtime. WORKER_THREADS is also what render.yaml,
+    # the Procfile and run_production.py pass to the server, so the reported pool size is the real one
+    app.config['WORKER_THREADS'] = int(os.environ.get("WORKER_THREADS", "16"))
+    runtime.init_app(app)
+
+    # Database Configuration
+    db_url = os.environ.get("DATABASE_URL", "sqlite:///baba_milk.db")
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_db_url(db_url)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Optional read replica for read-only pages; writes always go to DATABASE_URL
+    replica_url = os.environ.get("DATABASE_REPLICA_URL")
+    if replica_url:
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: normalize_db_url(replica_url)}
+    db.init_app(app)
+    db_router.init_app(app)
+    if click.get_current_context(silent=True) is not None:
+        init_migrate(app)
+
+    # Twilio Configuration (client is created on first send)
+    sms.init_app(app)
+
+    # Rate limiting ("memory" per process, or "database" to share across workers)
+    app.config['RATELIMIT_BACKEND'] = os.environ.get("RATELIMIT_BACKEND", "memory")
+    limiter.init_app(app)
+
+    # gzip/brotli for HTML and JSON responses. Hooks registered earlier (logging, replica pinning)
+    # run after it, which is fine as they only touch headers and the session, not the body
+    compress.init_app(app)
+
+    # Live order updates over SSE ("memory" for one worker, "postgres" for LISTEN/NOTIFY fan-out)
+    app.config['SSE_BACKEND'] = os.environ.get("SSE_BACKEND", "memory")
+    order_events.init_app(app)
+
+    # Number of reverse proxies in front of the app (1 on Render), so request.remote_addr is the client IP
+    proxy_count = int(os.environ.get("PROXY_FIX_X_FOR", "0"))
+    if proxy_count:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_count)
+    return app
+
+app = create_app()
 
 # Context Processor
 @app.context_processor
@@ -116,13 +116,6 @@ def utility_processor():
 def load_logged_in_user():
     user_id = session.get('user_id')
     g.user = None
-    otp_timestamp = session.get('otp_timestamp')
-    if otp_timestamp and (datetime.now().timestamp() - otp_timestamp > 300):
-        for key in ['otp_code', 'otp_phone', 'otp_timestamp', 'signup_name', 'action_type']:
-            session.pop(key, None)
-        session.modified = True
-        if request.path in ['/verify_otp', '/resend_otp']:
-            flash("Your OTP has expired. Please request a new one.", 'warning')
     if user_id:
         try:
             g.user = User.query.get(user_id)
@@ -172,6 +165,7 @@ def admin_required(f):
 # Routes
 @app.route('/')
 @app.route('/home')
+@db_router.replica_reads
 def home():
     all_products = Product.query.all()
     return render_template('home.html', all_products=all_products)
@@ -181,102 +175,101 @@ def account():
     return render_template('account.html')
 
 @app.route('/send_otp', methods=['POST'])
+@limiter.limit('otp-send', '3/10m', key=phone_key)
+@limiter.limit('otp-send-ip', '10/h', key=ip_key)
 def send_otp():
-    print("=== Received POST to /send_otp ===")
     phone_raw = request.form.get('phone')
     name = request.form.get('name').strip() if request.form.get('name') else None
     next_url = request.form.get('next', session.get('next', url_for('home')))
-    print(f"Input: phone_raw={phone_raw}, name={name}, next_url={next_url}")
     
     if not phone_raw:
         flash("Phone number is required.", 'danger')
-        print("Error: Phone number missing")
+        log.info("send_otp rejected: phone missing")
         return redirect(url_for('account'))
     
     phone_regex = r'^\+\d{10,15}$'
     if not re.match(phone_regex, phone_raw):
         flash("Please enter a valid international phone number (e.g., +12025550123 or +251912345678).", 'danger')
-        print(f"Error: Invalid phone number format: {phone_raw}")
+        log.info("send_otp rejected: invalid phone format", extra={'phone': phone_raw})
         return redirect(url_for('account'))
     
     phone = phone_raw
-    print(f"Normalized phone: {phone}")
     
     user_exists = User.query.filter_by(phone=phone).first()
     if not user_exists and not name:
         flash("Full name is required for signup.", 'danger')
-        print("Error: Name missing for signup")
+        log.info("send_otp rejected: name missing for signup", extra={'phone': phone})
         return redirect(url_for('account') + '#name-field')
     
-    otp = ''.join(random.choices(string.digits, k=6))
-    session['otp_code'] = otp
-    session['otp_phone'] = phone
-    session['otp_timestamp'] = datetime.now().timestamp()
-    session['action_type'] = 'login' if user_exists else 'signup'
-    session['signup_name'] = name if name else None
+    action_type = 'login' if user_exists else 'signup'
+    otp_store.maybe_purge_expired()
+    challenge, otp = otp_store.create_challenge(phone, action_type, name if name else None)
+    db.session.commit()
+    session['otp_challenge_id'] = challenge.id
     session['next'] = next_url
     session.modified = True
-    print(f"Session set: OTP={otp}, Phone={phone}, Action={session['action_type']}, Name={name}")
+    log.info("OTP challenge created", extra={'phone': phone, 'action_type': action_type})
     
-    if twilio_client and TWILIO_PHONE_NUMBER:
-        print(f"Attempting Twilio SMS to {phone} from {TWILIO_PHONE_NUMBER}")
+    if sms.is_configured():
         try:
-            message = twilio_client.messages.create(
-                to=phone,
-                from_=TWILIO_PHONE_NUMBER,
-                body=f"Your Baba Milk App verification code is: {otp}"
-            )
-            print(f"Twilio success: SID={message.sid}")
+            message_sid = sms.send_sms(phone, f"Your Baba Milk App verification code is: {otp}")
+            log.info("OTP SMS sent", extra={'phone': phone, 'sid': message_sid})
             flash(f"An OTP has been sent to {phone}.", 'info')
-        except TwilioRestException as e:
-            print(f"Twilio error sending OTP to {phone}: {e}")
-            flash(f"Failed to send OTP: {str(e)}. Please check your phone number or use console OTP.", 'danger')
-            print(f"🔐 OTP for {phone}: {otp} (Twilio failed, using console fallback)")
-        except Exception as e:
-            print(f"General error sending OTP to {phone}: {e}")
+        except sms.SMSError as e:
+            log.warning("OTP SMS failed", extra={'phone': phone, 'error': str(e)})
+            flash(f"Failed to send OTP: {str(e)}. Please check your phone number and try again.", 'danger')
+        except Exception:
+            log.exception("Unexpected error sending OTP SMS", extra={'phone': phone})
             flash("An unexpected error occurred while sending OTP. Please try again.", 'danger')
             return redirect(url_for('account'))
     else:
-        print(f"🔐 OTP for {phone}: {otp} (No Twilio client, using console)")
-        flash(f"OTP simulation: {otp}. Please check your console.", 'info')
+        # Development without Twilio: the code is shown on the page, never written to the logs
+        flash(f"OTP simulation: {otp}.", 'info')
     
-    print(f"Redirecting to verify_otp with phone={phone}")
     return redirect(url_for('verify_otp', phone=phone))
 
 @app.route('/verify_otp', methods=['GET', 'POST'])
+@limiter.limit('otp-verify', '5/5m', key=otp_challenge_key)
+@limiter.limit('otp-verify-ip', '30/10m', key=ip_key)
 def verify_otp():
-    phone = session.get('otp_phone')
-    if not phone:
+    challenge = otp_store.get_challenge(session.get('otp_challenge_id'))
+    if not challenge:
         flash("Session expired or no OTP request found. Please start again.", 'danger')
         return redirect(url_for('account'))
+    phone = challenge.phone
 
     if request.method == 'POST':
         user_otp = request.form.get('otp', '').strip()
-        stored_otp = session.get('otp_code')
-        otp_timestamp = session.get('otp_timestamp')
-        action_type = session.get('action_type')
+        action_type = challenge.action_type
 
-        if not all([user_otp, stored_otp, action_type, otp_timestamp]):
+        if not user_otp:
             flash("Missing verification data. Please try again.", 'danger')
-            session.clear()
-            session.modified = True
-            return redirect(url_for('account'))
+            return redirect(url_for('verify_otp', phone=phone))
 
-        # Check OTP expiry (5 min = 300 sec)
-        if datetime.now().timestamp() > otp_timestamp + 300:
+        # Check OTP expiry (5 min)
+        if otp_store.is_expired(challenge):
             flash("OTP has expired. Please request a new one.", 'danger')
-            session.clear()
-            session.modified = True
-            return redirect(url_for('account'))
+            return redirect(url_for('verify_otp', phone=phone))
 
-        if user_otp != stored_otp:
+        if challenge.attempts >= otp_store.MAX_ATTEMPTS:
+            flash("Too many incorrect attempts. Please request a new OTP.", 'danger')
+            return redirect(url_for('verify_otp', phone=phone))
+
+        if not otp_store.check_code(challenge, user_otp):
+            db.session.commit()
             flash("Invalid OTP. Please try again.", 'danger')
             return redirect(url_for('verify_otp', phone=phone))
 
+        # OTPs are single use
+        signup_name = challenge.signup_name
+        db.session.delete(challenge)
+        db.session.commit()
+        session.pop('otp_challenge_id', None)
+
         user = User.query.filter_by(phone=phone).first()
 
         if action_type == 'signup':
-            name = session.get('signup_name')  # ✅ FIXED: correct key for name
+            name = signup_name
             if user:
                 flash("Account already exists. Please log in.", 'warning')
                 session.clear()
@@ -289,7 +282,7 @@ def verify_otp():
                 session.modified = True
                 return redirect(url_for('account'))
 
-            hashed_password = generate_password_hash(stored_otp)
+            hashed_password = generate_password_hash(user_otp)
             user = User(name=name, phone=phone, password=hashed_password)
             db.session.add(user)
             db.session.commit()
@@ -313,22 +306,17 @@ def verify_otp():
         guest_cart = session.pop('cart', {})
         if guest_cart:
             try:
-                for pid_str, item in guest_cart.items():
-                    pid = int(pid_str)
-                    qty = int(item.get('quantity', 1))
-                    existing_item = CartItem.query.filter_by(user_id=user.id, product_id=pid).first()
-                    if existing_item:
-                        existing_item.quantity += qty
-                    else:
-                        db.session.add(CartItem(user_id=user.id, product_id=pid, quantity=qty))
+                merge_stats = cart_merge.merge_guest_cart(user.id, guest_cart)
                 db.session.commit()
-            except Exception as e:
+                if merge_stats['skipped']:
+                    flash("Some items in your cart are no longer available and were removed.", 'warning')
+                if merge_stats['capped']:
+                    flash(f"Cart quantities are limited to {cart_merge.MAX_ITEM_QUANTITY} per item.", 'warning')
+            except Exception:
                 db.session.rollback()
+                log.exception("Error merging guest cart", extra={'user_id': user.id})
                 flash("Unable to merge cart items. Please review your cart.", 'warning')
 
-        # ✅ Clean up OTP-related session keys
-        for key in ['otp_code', 'otp_phone', 'otp_timestamp', 'signup_name', 'action_type']:
-            session.pop(key, None)
         session.modified = True
 
         next_url = session.pop('next', url_for('dashboard'))
@@ -338,36 +326,31 @@ def verify_otp():
     return render_template('verify_otp.html', phone=phone)
 
 @app.route('/resend_otp', methods=['POST'])
+@limiter.limit('otp-resend', '3/10m', key=otp_challenge_key)
+@limiter.limit('otp-send-ip', '10/h', key=ip_key)
 def resend_otp():
-    phone = session.get('otp_phone')
-    action_type = session.get('action_type')
-    if not phone or not action_type:
+    challenge = otp_store.get_challenge(session.get('otp_challenge_id'))
+    if not challenge:
         flash("No active OTP request found. Please start from the account page.", 'danger')
         return redirect(url_for('account'))
-    otp = ''.join(random.choices(string.digits, k=6))
-    session['otp_code'] = otp
-    session['otp_timestamp'] = datetime.now().timestamp()
-    session.modified = True
-    if twilio_client and TWILIO_PHONE_NUMBER:
+    phone = challenge.phone
+    otp = otp_store.refresh_code(challenge)
+    db.session.commit()
+    if sms.is_configured():
         try:
-            message = twilio_client.messages.create(
-                to=phone,
-                from_=TWILIO_PHONE_NUMBER,
-                body=f"Your new OTP is: {otp} for Baba Milk App verification."
-            )
-            print(f"Twilio message SID (resend): {message.sid}")
+            message_sid = sms.send_sms(phone, f"Your new OTP is: {otp} for Baba Milk App verification.")
+            log.info("OTP SMS resent", extra={'phone': phone, 'sid': message_sid})
             flash(f"A new OTP has been sent to {phone}.", 'info')
-        except TwilioRestException as e:
-            print(f"Twilio error resending OTP to {phone}: {e}")
+        except sms.SMSError as e:
+            log.warning("OTP SMS resend failed", extra={'phone': phone, 'error': str(e)})
             flash("Failed to resend OTP. Please try again or check your phone number.", 'danger')
             return redirect(url_for('account'))
-        except Exception as e:
-            print(f"General error resending OTP to {phone}: {e}")
+        except Exception:
+            log.exception("Unexpected error resending OTP SMS", extra={'phone': phone})
             flash("An error occurred while resending OTP. Please try again.", 'danger')
             return redirect(url_for('account'))
     else:
-        print(f"Resent OTP for {phone}: {otp}")
-        flash(f"A new OTP has been sent to {phone}. Check your console.", 'info')
+        flash(f"OTP simulation: {otp}.", 'info')
     return redirect(url_for('verify_otp', phone=phone))
 
 @app.route('/cart', methods=['GET', 'POST'])
@@ -443,9 +426,10 @@ def add_to_cart():
             }
         session['cart'] = cart
         session.modified = True
+        log.debug("cart item added", extra={'product_id': product.id, 'quantity': quantity})
         return jsonify({'success': True, 'cart_count': sum(item['quantity'] for item in cart.values())})
-    except Exception as e:
-        print(f"Error adding to cart: {e}")
+    except Exception:
+        log.exception("Error adding to cart")
         return jsonify({'success': False, 'message': 'Error adding to cart.'}), 500
 
 @app.route('/get_cart_count')
@@ -495,8 +479,8 @@ def update_cart_quantity():
         session['cart'] = cart
         session.modified = True
         return jsonify({'success': True, 'message': message})
-    except Exception as e:
-        print(f"Error updating cart quantity: {e}")
+    except Exception:
+        log.exception("Error updating cart quantity")
         return jsonify({'success': False, 'message': 'Error updating cart.'}), 500
 
 @app.route('/remove_from_cart', methods=['POST'])
@@ -512,8 +496,8 @@ def remove_from_cart():
         session['cart'] = cart
         session.modified = True
         return jsonify({'success': True, 'message': f'{item_name} removed from cart.'})
-    except Exception as e:
-        print(f"Error removing item from cart: {e}")
+    except Exception:
+        log.exception("Error removing item from cart")
         return jsonify({'success': False, 'message': 'Error removing item.'}), 500
 
 @app.route('/payment', methods=['GET', 'POST'])
@@ -564,6 +548,21 @@ def finalize_order():
     try:
         total_amount = sum(float(item['price']) * item['quantity'] for item in cart.values())
 
+        products = {
+            product.id: product
+            for product in Product.query.filter(Product.id.in_([int(pid) for pid in cart])).all()
+        }
+        lines = []
+        for pid, item in cart.items():
+            product = products.get(int(pid))
+            if not product:
+                db.session.rollback()
+                flash(f"Product {item['name']} is no longer available.", 'danger')
+                session['delivery_info'] = delivery_info
+                session.modified = True
+                return redirect(url_for('cart'))
+            lines.append((product, item))
+
         new_order = Order(
             user_id=user_id,  # ✅ None if guest
             total_amount=total_amount,
@@ -571,26 +570,19 @@ def finalize_order():
             delivery_phone=delivery_info['phone'],
             payment_method=payment_info['method'],
             payment_details=json.dumps(payment_info['details']),
-            status='placed' if payment_info['method'] == 'cash_on_delivery' else f'pending_payment_{payment_info["method"]}'
+            status='placed' if payment_info['method'] == 'cash_on_delivery' else f'pending_payment_{payment_info["method"]}',
+            # Part of the INSERT, so the summary is written once
+            items_summary=format_items_summary((product.name, item['quantity']) for product, item in lines)
         )
         db.session.add(new_order)
-        db.session.flush()
-
-        for pid, item in cart.items():
-            product = Product.query.get(int(pid))
-            if not product:
-                flash(f"Product {item['name']} is no longer available.", 'danger')
-                session['delivery_info'] = delivery_info
-                session.modified = True
-                return redirect(url_for('cart'))
-
-            order_item = OrderItem(
-                order_id=new_order.id,
+        for product, item in lines:
+            db.session.add(OrderItem(
+                order=new_order,
                 product_id=product.id,
+                product_name=product.name,
                 quantity=item['quantity'],
                 price_at_purchase=item['price']
-            )
-            db.session.add(order_item)
+            ))
 
         # Only clear database cart if logged in
         if user_id:
@@ -603,64 +595,145 @@ def finalize_order():
         session.modified = True
 
         db.session.commit()
-        flash("Order placed successfully! Check your dashboard for details.", 'success')
-        return redirect(url_for('dashboard'))
 
-    except Exception as e:
+    except Exception:
         db.session.rollback()
-        print(f"Error finalizing order: {e}")
+        log.exception("Error finalizing order", extra={'user_id': user_id})
         flash("An error occurred while placing your order. Please try again.", 'danger')
         session['delivery_info'] = delivery_info
         session.modified = True
         return redirect(url_for('cart'))
 
+    try:
+        order_events.publish_created(admin_order_row(new_order))
+    except Exception:
+        log.exception("Error publishing new order event", extra={'order_id': new_order.id})
+    flash("Order placed successfully! Check your dashboard for details.", 'success')
+    return redirect(url_for('dashboard'))
+
 @app.route('/dashboard')
+@db_router.replica_reads
 @login_required
 def dashboard():
+    show_archived = request.args.get('archived') == '1'
     orders = Order.query.filter_by(user_id=g.user.id).order_by(Order.order_date.desc()).all()
-    return render_template('dashboard.html', orders=orders)
+    if show_archived:
+        # Archived orders are delivered/cancelled and older than every hot order
+        orders += archive.archived_orders(user_id=g.user.id)
+    return render_template('dashboard.html', orders=orders, show_archived=show_archived)
 
 @app.route('/admin', methods=['GET', 'POST'])
+@db_router.replica_reads
 @admin_required
 def admin():
     if request.method == 'POST':
         order_id = request.form.get('order_id')
         new_status = request.form.get('status')
-        valid_statuses = ['placed', 'pending_payment_telebirr', 'pending_payment_cbebirr', 'confirmed', 'packed', 'out_for_delivery', 'delivered', 'cancelled']
-        if not order_id or not new_status or new_status not in valid_statuses:
+        if not order_id or not new_status:
             flash('Invalid order ID or status.', 'danger')
             return redirect(url_for('admin'))
-        order = Order.query.get(order_id)
-        if order:
-            order.status = new_status
-            try:
-                db.session.commit()
-                flash(f'Order {order_id} status updated to {new_status.replace("_", " ").capitalize()}.', 'success')
-            except Exception as e:
-                db.session.rollback()
-                print(f"Error updating order status: {e}")
-                flash('Error updating order status.', 'danger')
-        else:
-            flash('Order not found.', 'danger')
-    orders = Order.query.order_by(Order.order_date.desc()).all()
-    orders_for_template = [
-        {
-            'id': order.id,
-            'customer': order.customer.name,
-            'customer_phone': order.customer.phone,
-            'delivery_address': order.delivery_address,
-            'items': order.items,
-            'date': order.date,
-            'total': order.total_amount,
-            'payment_method': order.payment_method,
-            'payment_details': order.payment_details,
-            'status': order.status,
-            'current_status_index': order.current_status_index,
-            'tracker_statuses': order.tracker_statuses
-        }
-        for order in orders
-    ]
-    return render_template('admin.html', orders=orders_for_template)
+        apply_status_change([order_id], new_status)
+    show_archived = request.args.get('archived') == '1'
+    if show_archived:
+        orders = archive.archived_orders()
+    else:
+        orders = Order.query.order_by(Order.order_date.desc()).all()
+    orders_for_template = [admin_order_row(order) for order in orders]
+    status_options = [(status, status_label(status)) for status in ORDER_STATUSES]
+    return render_template('admin.html', orders=orders_for_template, status_options=status_options,
+                           show_archived=show_archived)
+
+@app.route('/admin/orders/status', methods=['POST'])
+@admin_required
+def bulk_update_order_status():
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'message': 'Request body must be a JSON object.'}), 400
+        order_ids = data.get('order_ids')
+        if not isinstance(order_ids, list) or not all(
+            isinstance(order_id, int) and not isinstance(order_id, bool) for order_id in order_ids
+        ):
+            return jsonify({'success': False, 'message': 'order_ids must be a list of integers.'}), 400
+        new_status = data.get('status')
+    else:
+        order_ids = request.form.getlist('order_ids')
+        new_status = request.form.get('status')
+    result = apply_status_change(order_ids, new_status, flash_result=not request.is_json)
+    if not request.is_json:
+        return redirect(url_for('admin'))
+    if result is None:
+        return jsonify({'success': False, 'message': 'Invalid order IDs or status.'}), 400
+    return jsonify({
+        'success': True,
+        'updated': [order_id for order_id, _ in result['updated']],
+        'rejected': [{'id': order_id, 'status': status} for order_id, status in result['rejected']],
+        'missing': result['missing']
+    })
+
+def apply_status_change(order_ids, new_status, flash_result=True):
+    try:
+        result = order_status.transition_orders(order_ids, new_status, changed_by=session.get('user_id'))
+    except order_status.StatusChangeError as e:
+        if flash_result:
+            flash(str(e), 'danger')
+        return None
+    except Exception:
+        log.exception("Error updating order status", extra={'status': new_status})
+        if flash_result:
+            flash('Error updating order status.', 'danger')
+        return None
+
+    order_events.publish_status(result['updated'], new_status)
+
+    if flash_result:
+        label = status_label(new_status)
+        if len(result['updated']) == 1 and not result['rejected'] and not result['missing']:
+            flash(f"Order {result['updated'][0][0]} status updated to {label}.", 'success')
+        elif result['updated']:
+            flash(f"{len(result['updated'])} orders updated to {label}.", 'success')
+        for order_id, status in result['rejected']:
+            flash(f"Order {order_id} cannot move from {status_label(status)} to {label}.", 'danger')
+        if result['missing']:
+            flash(f"Orders not found: {', '.join(str(order_id) for order_id in result['missing'])}.", 'danger')
+    return result
+
+def admin_order_row(order):
+    return {
+        'id': order.id,
+        'customer': order.customer.name,
+        'customer_phone': order.customer.phone,
+        'delivery_address': order.delivery_address,
+        'items': order.items,
+        'date': order.date,
+        'total': order.total_amount,
+        'payment_method': order.payment_method,
+        'payment_details': order.payment_details,
+        'status': order.status,
+        'current_status_index': order.current_status_index,
+        'tracker_statuses': order.tracker_statuses
+    }
+
+@app.route('/events/orders')
+@login_required
+def order_events_stream():
+    if session.get('is_admin'):
+        channels = [events.ADMIN_CHANNEL]
+    else:
+        channels = [events.user_channel(session['user_id'])]
+    if not order_events.try_open_stream(app.config['SSE_MAX_STREAMS']):
+        # Each stream holds a worker thread. EventSource gives up for good on any non-200 answer,
+        # so past the cap send a 200 stream that only sets a long retry delay and closes
+        retry_ms = app.config['SSE_BUSY_RETRY_SECONDS'] * 1000
+        return Response(f"retry: {retry_ms}\n\n", mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    response = Response(
+        order_events.stream(channels, app.config['SSE_KEEPALIVE_SECONDS'], app.config['SSE_STREAM_SECONDS']),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(order_events.close_stream)
+    return response
 
 @app.route('/logout')
 def logout():
@@ -681,6 +754,7 @@ def terms_of_service():
     return render_template('terms_of_service.html')
 
 @app.route('/search_products', methods=['GET'])
+@db_router.replica_reads
 def search_products():
     query = request.args.get('query', '').strip()
     if not query:
@@ -703,75 +777,136 @@ def search_products():
     ]
     return jsonify(products=search_results), 200
 
+@app.route('/products', methods=['GET'])
+@db_router.replica_reads
+def list_products():
+    try:
+        category = request.args.get('category', '').strip().lower() or None
+        sort = request.args.get('sort', 'price_asc')
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 24))
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers.'}), 400
+    try:
+        min_price, max_price = (
+            float(request.args[name]) if request.args.get(name, '').strip() else None
+            for name in ('min_price', 'max_price')
+        )
+    except ValueError:
+        return jsonify({'error': 'min_price and max_price must be numbers.'}), 400
+    if any(price is not None and not math.isfinite(price) for price in (min_price, max_price)):
+        return jsonify({'error': 'min_price and max_price must be numbers.'}), 400
+    if sort not in catalog.BROWSE_SORTS:
+        return jsonify({'error': f"sort must be one of {', '.join(catalog.BROWSE_SORTS)}."}), 400
+    if page < 1 or not 1 <= per_page <= MAX_PRODUCTS_PER_PAGE:
+        return jsonify({'error': f"page must be at least 1 and per_page between 1 and {MAX_PRODUCTS_PER_PAGE}."}), 400
+
+    index = catalog.get_catalog_index()
+    products, total = index.query(category, min_price, max_price, sort, page, per_page)
+    return jsonify({
+        'products': [
+            dict(product, image_path=url_for('static', filename='images/' + (product['image_path'] or 'default.png')))
+            for product in products
+        ],
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'facets': {'category': index.facets(min_price, max_price)},
+        'catalog_version': index.version
+    }), 200
+
+# Health and diagnostics
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok'}), 200
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    ready, checks = runtime.readiness()
+    return jsonify({'status': 'ready' if ready else 'not ready', 'checks': checks}), 200 if ready else 503
+
+@app.route('/debug/runtime', methods=['GET'])
+@admin_required
+def debug_runtime():
+    # ?tracemalloc=start|stop|snapshot; tracing slows every allocation, so it stays off unless asked for
+    action = request.args.get('tracemalloc')
+    if action not in (None, 'start', 'stop', 'snapshot'):
+        return jsonify({'error': 'tracemalloc must be start, stop or snapshot.'}), 400
+    return jsonify(runtime.report(action)), 200
+
 # Data Population
-products_data = [
-    {"name": "Fresh Cow Milk (1L)", "category": "milk", "price": 80.00, "image_suffix": "1", "description": "Pure, pasteurized cow milk, delivered fresh daily."},
-    {"name": "Organic Whole Milk (1L)", "category": "milk", "price": 95.00, "image_suffix": "2", "description": "Sourced from organic farms, rich in nutrients and flavor."},
-    {"name": "Low-Fat Milk (1L)", "category": "milk", "price": 70.00, "image_suffix": "3", "description": "A healthy choice with reduced fat content, perfect for everyday use."},
-    {"name": "Lactose-Free Milk (1L)", "category": "milk", "price": 110.00, "image_suffix": "4", "description": "Easy to digest, all the goodness of milk without lactose."},
-    {"name": "Skim Milk (1L)", "category": "milk", "price": 65.00, "image_suffix": "5", "description": "Virtually fat-free, ideal for health-conscious individuals."},
-    {"name": "Goat Milk (500ml)", "category": "milk", "price": 120.00, "image_suffix": "6", "description": "Nutrient-rich goat milk, a great alternative for sensitive stomachs."},
-    {"name": "Almond Milk (1L)", "category": "milk", "price": 100.00, "image_suffix": "7", "description": "Dairy-free almond milk, perfect for vegans or those with intolerances."},
-    {"name": "Soy Milk (1L)", "category": "milk", "price": 90.00, "image_suffix": "8", "description": "Plant-based soy milk, high in protein and versatile."},
-    {"name": "Chocolate Milk (2L)", "category": "milk", "price": 95.00, "image_suffix": "9", "description": "Rich chocolate-flavored milk, a treat for all ages."},
-    {"name": "Strawberry Milk (500ml)", "category": "milk", "price": 95.00, "image_suffix": "10", "description": "Sweet strawberry-flavored milk, a fun drink for kids."},
-    {"name": "Cheddar Cheese (200g)", "category": "cheese", "price": 150.00, "image_suffix": "11", "description": "Classic sharp cheddar cheese block, aged to perfection."},
-    {"name": "Mozzarella Cheese (200g)", "category": "cheese", "price": 130.00, "image_suffix": "12", "description": "Perfect for pizzas and pastas, melts beautifully and stretches."},
-    {"name": "Feta Cheese (150g)", "category": "cheese", "price": 120.00, "image_suffix": "13", "description": "Tangy and salty, ideal for salads and Mediterranean dishes."},
-    {"name": "Gouda Cheese (200g)", "category": "cheese", "price": 160.00, "image_suffix": "14", "description": "Semi-hard cheese with a mild, nutty flavor."},
-    {"name": "Cream Cheese (250g)", "category": "cheese", "price": 100.00, "image_suffix": "15", "description": "Smooth and spreadable, great for bagels and cooking."},
-    {"name": "Parmesan Cheese (100g)", "category": "cheese", "price": 180.00, "image_suffix": "16", "description": "Hard, granular cheese perfect for grating over pasta."},
-    {"name": "Ricotta Cheese (250g)", "category": "cheese", "price": 90.00, "image_suffix": "17", "description": "Soft and creamy, ideal for Italian desserts and savory dishes."},
-    {"name": "Cottage Cheese (250g)", "category": "cheese", "price": 80.00, "image_suffix": "18", "description": "High in protein, a versatile and healthy snack."},
-    {"name": "Swiss Cheese (200g)", "category": "cheese", "price": 140.00, "image_suffix": "19", "description": "Distinctive holes and a mild, nutty taste."},
-    {"name": "Provolone Cheese (200g)", "category": "cheese", "price": 135.00, "image_suffix": "20", "description": "Versatile cheese, great for sandwiches and melting."},
-    {"name": "Plain Yogurt (500g)", "category": "yogurt", "price": 70.00, "image_suffix": "21", "description": "Creamy and natural plain yogurt, great for breakfast or cooking."},
-    {"name": "Strawberry Yogurt (200g)", "category": "yogurt", "price": 55.00, "image_suffix": "22", "description": "Sweet strawberry-flavored yogurt, a delightful snack."},
-    {"name": "Vanilla Bean Yogurt (200g)", "category": "yogurt", "price": 60.00, "image_suffix": "23", "description": "Smooth vanilla yogurt with real bean specks."},
-    {"name": "Greek Yogurt (250g)", "category": "yogurt", "price": 85.00, "image_suffix": "24", "description": "Thick and protein-rich Greek yogurt."},
-    {"name": "Blueberry Yogurt (200g)", "category": "yogurt", "price": 58.00, "image_suffix": "25", "description": "Fruity yogurt with juicy blueberries."},
-    {"name": "Mango Yogurt (200g)", "category": "yogurt", "price": 58.00, "image_suffix": "26", "description": "Tropical mango-flavored yogurt."},
-    {"name": "Honey Yogurt (200g)", "category": "yogurt", "price": 62.00, "image_suffix": "27", "description": "Naturally sweetened with pure honey."},
-    {"name": "Peach Yogurt (200g)", "category": "yogurt", "price": 55.00, "image_suffix": "28", "description": "Refreshing peach-flavored yogurt."},
-    {"name": "Low-Fat Yogurt (500g)", "category": "yogurt", "price": 65.00, "image_suffix": "29", "description": "Healthy low-fat option for everyday consumption."},
-    {"name": "Probiotic Yogurt (200g)", "category": "yogurt", "price": 75.00, "image_suffix": "30", "description": "Contains live cultures for digestive health."},
-    {"name": "Salted Butter (250g)", "category": "butter", "price": 90.00, "image_suffix": "31", "description": "Rich and creamy salted butter, perfect for spreading."},
-    {"name": "Unsalted Butter (250g)", "category": "butter", "price": 90.00, "image_suffix": "32", "description": "Pure, unsalted butter for baking and cooking, allows flavor control."},
-    {"name": "Ghee (Clarified Butter, 500g)", "category": "butter", "price": 200.00, "image_suffix": "33", "description": "Traditional clarified butter, rich flavor and high smoke point."},
-    {"name": "Garlic Herb Butter (150g)", "category": "butter", "price": 110.00, "image_suffix": "34", "description": "Infused with garlic and herbs, perfect for steaks or bread."},
-    {"name": "Whipped Butter (200g)", "category": "butter", "price": 85.00, "image_suffix": "35", "description": "Light and airy whipped butter, easy to spread."},
-    {"name": "Cultured Butter (250g)", "category": "butter", "price": 105.00, "image_suffix": "36", "description": "Tangy and flavorful, made from cultured cream."},
-    {"name": "European Style Butter (250g)", "category": "butter", "price": 115.00, "image_suffix": "37", "description": "Higher fat content for richer taste and texture."},
-    {"name": "Light Butter (250g)", "category": "butter", "price": 75.00, "image_suffix": "38", "description": "Reduced-fat butter alternative."},
-    {"name": "Brown Butter (100g)", "category": "butter", "price": 130.00, "image_suffix": "39", "description": "Nutty and aromatic, great for desserts and savory dishes."},
-    {"name": "Avocado Oil Butter (250g)", "category": "butter", "price": 125.00, "image_suffix": "40", "description": "Blend of butter and healthy avocado oil."}
-]
+def print_sync_stats(stats):
+    print(f"Catalog sync: {stats['inserted']} inserted, {stats['updated']} updated, "
+          f"{stats['unchanged']} unchanged (catalog version {stats['version']}).")
+
+@app.cli.command('sync-catalog')
+@click.argument('path', default=catalog.DEFAULT_CATALOG_PATH, type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=catalog.DEFAULT_CHUNK_SIZE, show_default=True, help='Rows per bulk upsert statement.')
+@click.option('--dry-run', is_flag=True, help='Report the diff without writing anything.')
+def sync_catalog_command(path, chunk_size, dry_run):
+    try:
+        rows = catalog.load_catalog_file(path)
+        stats = catalog.sync_catalog(rows, chunk_size=chunk_size, dry_run=dry_run)
+    except catalog.CatalogError as e:
+        raise click.ClickException(str(e))
+    if dry_run:
+        print("Dry run, no changes written.")
+    print_sync_stats(stats)
+
+@app.cli.command('purge-otp')
+def purge_otp_command():
+    deleted = otp_store.purge_expired()
+    db.session.commit()
+    print(f"Purged {deleted} expired OTP challenges.")
+
+@app.cli.command('archive-orders')
+@click.option('--days', default=90, show_default=True, help='Archive delivered/cancelled orders older than this many days.')
+@click.option('--batch-size', default=archive.DEFAULT_BATCH_SIZE, show_default=True, help='Orders moved per transaction.')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches.')
+@click.option('--dry-run', is_flag=True, help='Only count the orders that would be archived.')
+def archive_orders_command(days, batch_size, max_batches, dry_run):
+    if dry_run:
+        print(f"{archive.count_archivable(days)} orders would be archived.")
+        return
+    total = 0
+    for moved in archive.archive_orders(days, batch_size=batch_size, max_batches=max_batches):
+        total += moved
+        print(f"Archived {moved} orders ({total} so far).")
+    print(f"Done, {total} orders archived.")
+
+@app.cli.command('generate-data')
+@click.option('--users', default=1000, show_default=True, help='Customers to create.')
+@click.option('--mean-orders', default=8, show_default=True, help='Average orders per customer (Pareto distributed).')
+@click.option('--days', default=365, show_default=True, help='Spread order dates over this many past days.')
+@click.option('--cart-share', default=0.3, show_default=True, help='Share of customers with a saved cart.')
+@click.option('--seed', type=int, default=None, help='Random seed for a repeatable data set.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per bulk insert statement.')
+def generate_data_command(users, mean_orders, days, cart_share, seed, chunk_size):
+    # Development tool only, so keep it off the app's import path
+    import synthetic_data
+    try:
+        counts = synthetic_data.generate(users=users, mean_orders=mean_orders, days=days,
+                                         cart_share=cart_share, seed=seed, chunk_size=chunk_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    synthetic_data.analyze()
+    print(f"Inserted {counts['users']} users, {counts['orders']} orders, "
+          f"{counts['order_items']} order items and {counts['cart_items']} cart items.")
 
 @app.cli.command('init-db')
 def init_db_command():
     with app.app_context():
         db.create_all()
         print("Database initialized.")
-        Product.query.delete()
-        db.session.commit()
-        print("Existing products deleted.")
-        for p_data in products_data:
-            image_name = f"product{p_data['image_suffix']}.png"
-            new_product = Product(
-                name=p_data['name'],
-                category=p_data['category'],
-                price=p_data['price'],
-                image_path=image_name,
-                description=p_data.get('description')
-            )
-            db.session.add(new_product)
-        db.session.commit()
-        print(f"Total {len(products_data)} products added.")
+        # Upsert instead of delete + re-add so existing order items keep their product ids
+        print_sync_stats(catalog.sync_catalog(catalog.load_catalog_file()))
         if not User.query.filter_by(is_admin=True).first():
             print("Admin user missing. Creating...")
             admin_user = User(
                 name="Admin",
                 phone="+251911223344",
+                password=generate_password_hash(secrets.token_urlsafe(16)),  # Login is OTP-only
                 is_admin=True,
                 address="Admin Office, Addis Ababa"
             )
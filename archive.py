@@ -0,0 +1,83 @@
+"""Hot/cold split of order history.
+
+Delivered and cancelled orders older than a cutoff are moved, together with
+their items and status audit rows, into the ``*_archive`` tables in chunked
+batches. Day-to-day pages only query the hot tables and read the archive
+when asked to.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from models import (
+    db, Order, OrderItem, OrderStatusChange, ArchivedOrder, ArchivedOrderItem,
+    ArchivedOrderStatusChange, ARCHIVABLE_STATUSES
+)
+
+DEFAULT_BATCH_SIZE = 500
+
+# Child tables moved alongside each order, keyed by their order_id column
+CHILD_TABLES = (
+    (OrderItem, ArchivedOrderItem),
+    (OrderStatusChange, ArchivedOrderStatusChange),
+)
+
+
+def _copy_rows(hot, cold, condition):
+    table = hot.__table__
+    names = [column.name for column in table.columns]
+    db.session.execute(
+        insert(cold.__table__).from_select(names, select(*[table.c[name] for name in names]).where(condition))
+    )
+
+
+def _delete_rows(model, condition):
+    db.session.execute(delete(model).where(condition).execution_options(synchronize_session=False))
+
+
+def archive_batch(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """Move up to ``batch_size`` archivable orders placed before ``cutoff``; returns how many moved."""
+    order_ids = db.session.execute(
+        select(Order.id)
+        .where(Order.status.in_(ARCHIVABLE_STATUSES), Order.order_date < cutoff)
+        .order_by(Order.id)
+        .limit(batch_size)
+    ).scalars().all()
+    if not order_ids:
+        return 0
+    try:
+        _copy_rows(Order, ArchivedOrder, Order.id.in_(order_ids))
+        for hot, cold in CHILD_TABLES:
+            _copy_rows(hot, cold, hot.order_id.in_(order_ids))
+        for hot, _ in CHILD_TABLES:
+            _delete_rows(hot, hot.order_id.in_(order_ids))
+        _delete_rows(Order, Order.id.in_(order_ids))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(order_ids)
+
+
+def archive_orders(older_than_days, batch_size=DEFAULT_BATCH_SIZE, max_batches=None):
+    """Yield the size of each archived batch until nothing old enough is left."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return
+        batches += 1
+        yield moved
+
+
+def count_archivable(older_than_days):
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    return Order.query.filter(Order.status.in_(ARCHIVABLE_STATUSES), Order.order_date < cutoff).count()
+
+
+def archived_orders(user_id=None):
+    query = ArchivedOrder.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    return query.order_by(ArchivedOrder.order_date.desc()).all()
@@ -0,0 +1,83 @@
+"""Query count and time of the guest-cart merge at login, by cart size.
+
+Seeds a throwaway SQLite database with extra products, then merges guest
+carts of growing size into a user's cart that already holds half of those
+products. Exits non-zero if the number of SQL statements grows with the
+cart, so it doubles as a regression check.
+
+    python benchmarks/bench_cart_merge.py --sizes 1 10 100 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def setup_app(db_path, product_count):
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    os.environ['RATELIMIT_BACKEND'] = 'memory'
+    from app import app
+    from models import db, Product
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Product(name=f"Bench product {i}", category='milk', price=10.0) for i in range(product_count)
+        ])
+        db.session.commit()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(os.path.join(tmp, 'bench.db'), max(args.sizes))
+        from sqlalchemy import event
+        from models import db, User, CartItem
+        import cart_merge
+
+        counts = {}
+        print(f"{'cart lines':>10} {'statements':>11} {'ms':>8} {'merged':>7} {'skipped':>8} {'capped':>7}")
+        with app.app_context():
+            for n, size in enumerate(args.sizes):
+                user = User(name=f"Bench {n}", phone=f"+2519000{n:05d}", password='x')
+                db.session.add(user)
+                db.session.flush()
+                # Half the products already in the saved cart, one of them near the cap
+                db.session.add_all([
+                    CartItem(user_id=user.id, product_id=pid, quantity=cart_merge.MAX_ITEM_QUANTITY if pid == 1 else 1)
+                    for pid in range(1, size + 1, 2)
+                ])
+                db.session.commit()
+                guest_cart = {str(pid): {'quantity': 2} for pid in range(1, size + 1)}
+                guest_cart['999999'] = {'quantity': 1}  # no such product
+
+                statements = []
+                listener = lambda conn, cursor, statement, *rest: statements.append(statement)
+                event.listen(db.engine, 'before_cursor_execute', listener)
+                start = time.perf_counter()
+                stats = cart_merge.merge_guest_cart(user.id, guest_cart)
+                db.session.commit()
+                elapsed = (time.perf_counter() - start) * 1000
+                event.remove(db.engine, 'before_cursor_execute', listener)
+
+                counts[size] = len(statements)
+                print(f"{size:>10} {len(statements):>11} {elapsed:>8.2f} {stats['merged']:>7} "
+                      f"{len(stats['skipped']):>8} {len(stats['capped']):>7}")
+                assert CartItem.query.filter_by(user_id=user.id).count() == size
+                assert stats['skipped'] == [999999] and stats['capped'] == [1]
+
+    if len(set(counts.values())) != 1:
+        raise SystemExit(f"Statement count grows with cart size: {counts}")
+    print(f"\nConstant {next(iter(counts.values()))} statements per merge.")
+
+
+if __name__ == '__main__':
+    main()
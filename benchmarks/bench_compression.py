@@ -0,0 +1,116 @@
+"""CPU cost versus bytes saved by response compression, per endpoint.
+
+Builds a throwaway SQLite database with the seed catalog and some orders,
+renders each endpoint once uncompressed, then times compressing that body
+with every available encoding and level.
+
+    python benchmarks/bench_compression.py --orders 200 --runs 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def setup_app(db_path, order_count):
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    os.environ['RATELIMIT_BACKEND'] = 'memory'
+    from app import app
+    from models import db, User, Product, Order, OrderItem
+    import catalog
+
+    with app.app_context():
+        db.create_all()
+        catalog.sync_catalog(catalog.load_catalog_file())
+        admin = User(name="Admin", phone="+251911223344", password="x", is_admin=True)
+        customer = User(name="Customer", phone="+251911000000", password="x")
+        db.session.add_all([admin, customer])
+        db.session.flush()
+        products = Product.query.all()
+        for i in range(order_count):
+            order = Order(user_id=customer.id, total_amount=0, delivery_address="Bole, Addis Ababa",
+                          delivery_phone=customer.phone, payment_method='cash_on_delivery')
+            db.session.add(order)
+            db.session.flush()
+            for product in products[i % 7:i % 7 + 3]:
+                db.session.add(OrderItem(order_id=order.id, product_id=product.id, quantity=2,
+                                         price_at_purchase=product.price))
+        db.session.commit()
+        return app, admin.id, customer.id
+
+
+def get_ok(client, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise SystemExit(f"GET {url} returned {response.status_code}")
+    return response.get_data()
+
+
+def fetch_bodies(app, admin_id, customer_id):
+    client = app.test_client()
+    client.post('/add_to_cart', json={'product_id': 1, 'quantity': 2})
+    client.post('/add_to_cart', json={'product_id': 12, 'quantity': 1})
+    bodies = {
+        'home.html': get_ok(client, '/'),
+        '/search_products?query=milk': get_ok(client, '/search_products?query=milk'),
+        '/get_cart_items': get_ok(client, '/get_cart_items'),
+    }
+    with client.session_transaction() as sess:
+        sess['user_id'] = customer_id
+    bodies['dashboard.html'] = get_ok(client, '/dashboard')
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin_id
+        sess['is_admin'] = True
+    bodies['admin.html'] = get_ok(client, '/admin')
+    return bodies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app, admin_id, customer_id = setup_app(os.path.join(tmp, 'bench.db'), args.orders)
+        app.config['COMPRESS_ENABLED'] = False
+        bodies = fetch_bodies(app, admin_id, customer_id)
+
+    import compression
+    variants = [('gzip', level) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        variants += [('br', level) for level in (1, 4, 11)]
+    else:
+        print("brotli not installed; only gzip is measured.\n")
+
+    print(f"{'endpoint':<30} {'raw':>8} {'encoding':>9} {'bytes':>8} {'saved':>7} {'cpu ms':>8} {'KB saved/cpu ms':>16}")
+    for endpoint, body in bodies.items():
+        for encoding, level in variants:
+            start = time.process_time()
+            for _ in range(args.runs):
+                compressed = compression.compress_body(body, encoding, level)
+            cpu_ms = (time.process_time() - start) * 1000 / args.runs
+            saved = len(body) - len(compressed)
+            efficiency = (saved / 1024) / cpu_ms if cpu_ms else float('inf')
+            print(f"{endpoint:<30} {len(body):>8} {encoding + '-' + str(level):>9} {len(compressed):>8} "
+                  f"{saved / len(body):>6.0%} {cpu_ms:>8.3f} {efficiency:>16.1f}")
+
+    cache = compression.CompressedBodyCache(1024 * 1024)
+    compressor = compression.Compress()
+    compressor.cache = cache
+    config = {'COMPRESS_GZIP_LEVEL': 6, 'COMPRESS_BR_LEVEL': 4}
+    body = bodies['home.html']
+    compressor.compress(body, 'gzip', config)
+    start = time.process_time()
+    for _ in range(args.runs):
+        compressor.compress(body, 'gzip', config)
+    cached_ms = (time.process_time() - start) * 1000 / args.runs
+    print(f"\nhome.html gzip-6 served from the compressed-body cache: {cached_ms:.3f} ms CPU per response")
+
+
+if __name__ == '__main__':
+    main()
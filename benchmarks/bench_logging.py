@@ -0,0 +1,115 @@
+"""Request latency with synchronous versus queued logging.
+
+Runs the hot routes (``/send_otp``, ``/add_to_cart``) from several threads
+while log lines go to a deliberately slow, lock-protected sink that stands
+in for a congested stdout pipe. In ``sync`` mode every line is written on
+the request thread, as the old ``print()`` calls were; in ``queue`` mode
+requests only enqueue records and the listener thread does the writing.
+
+    python benchmarks/bench_logging.py --threads 4 --requests 200 --write-us 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class SlowSink:
+    """A stream whose writes are serialized and each take ``write_us`` microseconds."""
+
+    def __init__(self, write_us):
+        self.delay = write_us / 1_000_000
+        self.lock = threading.Lock()
+        self.lines = 0
+
+    def write(self, data):
+        with self.lock:
+            time.sleep(self.delay)
+            self.lines += data.count('\n')
+
+    def flush(self):
+        pass
+
+
+def setup_app(db_path):
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    os.environ['RATELIMIT_BACKEND'] = 'memory'
+    from app import app
+    from models import db
+    import catalog
+
+    app.config['RATELIMIT_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        catalog.sync_catalog(catalog.load_catalog_file())
+    return app
+
+
+def run_worker(app, worker, requests, timings):
+    client = app.test_client()
+    for i in range(requests):
+        if i % 4 == 0:
+            start = time.perf_counter()
+            client.post('/send_otp', data={'phone': f"+2519{worker:02d}{i:06d}", 'name': 'Bench'})
+            timings['/send_otp'].append(time.perf_counter() - start)
+        else:
+            start = time.perf_counter()
+            client.post('/add_to_cart', json={'product_id': 1 + i % 40, 'quantity': 1})
+            timings['/add_to_cart'].append(time.perf_counter() - start)
+
+
+def measure(app, threads, requests):
+    timings = {'/send_otp': [], '/add_to_cart': []}
+    workers = [threading.Thread(target=run_worker, args=(app, n, requests, timings)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return timings
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per thread.')
+    parser.add_argument('--write-us', type=int, default=2000, help='Time one write to the log sink takes.')
+    parser.add_argument('--level', default='DEBUG')
+    parser.add_argument('--sample-rate', type=float, default=1.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = setup_app(os.path.join(tmp, 'bench.db'))
+        from structured_logging import structured_logging
+
+        results = {}
+        for mode in ('sync', 'queue'):
+            sink = SlowSink(args.write_us)
+            structured_logging.configure(args.level, args.sample_rate, use_queue=(mode == 'queue'), stream=sink)
+            measure(app, 1, 8)  # warm up
+            results[mode] = measure(app, args.threads, args.requests)
+            structured_logging.stop()
+            results[mode]['lines'] = sink.lines
+
+    print(f"{'route':<14} {'mode':<6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for route in ('/send_otp', '/add_to_cart'):
+        for mode in ('sync', 'queue'):
+            values = results[mode][route]
+            print(f"{route:<14} {mode:<6} {percentile(values, 50):>8.2f} {percentile(values, 95):>8.2f} "
+                  f"{percentile(values, 99):>8.2f} {statistics.mean(values) * 1000:>8.2f}")
+    for mode in ('sync', 'queue'):
+        print(f"{mode}: {results[mode]['lines']} log lines written")
+
+
+if __name__ == '__main__':
+    main()
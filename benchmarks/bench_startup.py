@@ -0,0 +1,70 @@
+"""Import-time benchmark for the web app.
+
+Runs ``python -X importtime -c "import app"`` in fresh interpreters and
+fails if the median cumulative import time goes over budget, or if one of
+the modules that is supposed to load lazily shows up in the import path.
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 900
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on first use
+LAZY_MODULES = ['twilio.rest', 'flask_migrate', 'alembic']
+
+LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def measure(module):
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    imports = {}
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            imports[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('STARTUP_BUDGET_MS', 900)))
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    totals = []
+    last = {}
+    for _ in range(args.runs):
+        last = measure(args.module)
+        totals.append(last[args.module][1] / 1000)
+
+    median = statistics.median(totals)
+    print(f"import {args.module}: median {median:.1f} ms over {args.runs} runs "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}, budget {args.budget_ms:.0f})")
+    print(f"Top {args.top} modules by self time:")
+    for name, (self_us, cumulative_us) in sorted(last.items(), key=lambda kv: kv[1][0], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    eager = [name for name in LAZY_MODULES if name in last]
+    if eager:
+        failures.append(f"lazy modules imported eagerly: {', '.join(eager)}")
+    if median > args.budget_ms:
+        failures.append(f"median import time {median:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
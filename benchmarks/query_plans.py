@@ -0,0 +1,322 @@
+"""EXPLAIN plans and timings for every query the routes issue.
+
+Fills a scratch database with synthetic data (``synthetic_data.generate``),
+drives each route through the test client while recording the SQL it
+sends, then runs EXPLAIN on every distinct statement and times the
+SELECTs. Save a baseline and compare later runs against it: changed plans
+and newly appearing full table scans are flagged and make the run fail.
+
+    python benchmarks/query_plans.py --save benchmarks/query_plans_baseline.json
+    python benchmarks/query_plans.py --compare benchmarks/query_plans_baseline.json
+
+A throwaway SQLite file is used by default. ``--database-url`` runs against
+another database, e.g. a scratch PostgreSQL one; all its tables are dropped
+and recreated.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SKIPPED_PREFIXES = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA', 'SELECT PG_NOTIFY')
+IN_LIST = re.compile(r'\((?:\?|%\(\w+\)s)(?:, (?:\?|%\(\w+\)s))+\)')
+PG_COSTS = re.compile(r'\s+\(cost=[^)]*\)')
+
+
+def normalize_sql(statement):
+    statement = ' '.join(statement.split())
+    # Expanded IN lists vary in length with the data; treat them as one statement
+    return IN_LIST.sub('(...)', statement)
+
+
+def full_scans(dialect, plan):
+    if dialect == 'sqlite':
+        return [line.strip() for line in plan
+                if line.strip().startswith('SCAN ') and 'USING' not in line and 'CONSTANT ROW' not in line]
+    return [line.strip() for line in plan if 'Seq Scan on' in line]
+
+
+class Recorder:
+    def __init__(self):
+        self.route = None
+        self.statements = OrderedDict()  # normalized sql -> entry
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['query_started'] = time.perf_counter()
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info.pop('query_started', time.perf_counter())) * 1000
+        if self.route is None or statement.lstrip().upper().startswith(SKIPPED_PREFIXES):
+            return
+        if parameters and isinstance(parameters, list) and isinstance(parameters[0], (tuple, list, dict)):
+            parameters = parameters[0]  # executemany: one parameter set is enough for EXPLAIN
+        key = normalize_sql(statement)
+        entry = self.statements.setdefault(key, {
+            'sql': statement,
+            'parameters': parameters,
+            'routes': [],
+            'calls': 0,
+            'captured_ms': [],
+        })
+        if self.route not in entry['routes']:
+            entry['routes'].append(self.route)
+        entry['calls'] += 1
+        entry['captured_ms'].append(elapsed)
+
+    @contextmanager
+    def capture(self, route):
+        self.route = route
+        try:
+            yield
+        finally:
+            self.route = None
+
+
+def setup_database(database_url, users, seed):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['RATELIMIT_BACKEND'] = 'memory'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from app import app, init_migrate
+    from flask_migrate import stamp
+    from models import db, User, Order
+    import archive
+    import catalog
+    import synthetic_data
+
+    app.config['RATELIMIT_ENABLED'] = False
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # create_all bypasses Alembic; stamp the head so /readyz sees an up-to-date schema
+        init_migrate(app)
+        stamp(directory=os.path.join(ROOT, 'migrations'))
+        catalog.sync_catalog(catalog.load_catalog_file())
+        admin = User(name="Admin", phone="+251911223344", password="x", is_admin=True)
+        db.session.add(admin)
+        db.session.commit()
+        counts = synthetic_data.generate(users=users, seed=seed)
+        for _ in archive.archive_orders(older_than_days=180):
+            pass
+        synthetic_data.analyze()
+        # The busiest customer is the worst case for the dashboard
+        customer_id = db.session.execute(
+            db.select(Order.user_id).group_by(Order.user_id).order_by(db.func.count().desc()).limit(1)
+        ).scalar()
+        customer = db.session.get(User, customer_id)
+        recent_orders = db.session.execute(
+            db.select(Order.id).where(Order.status == 'placed').limit(50)
+        ).scalars().all()
+        return app, counts, admin.id, customer.id, customer.phone, recent_orders
+
+
+def drive_routes(app, recorder, admin_id, customer_id, customer_phone, recent_orders):
+    import otp as otp_store
+    from models import db
+
+    def login(client, user_id, is_admin=False):
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+            sess['is_admin'] = is_admin
+
+    guest = app.test_client()
+    for route, path in (('home', '/'), ('readyz', '/readyz'), ('search_products', '/search_products?query=milk'),
+                        ('list_products', '/products?category=cheese&sort=price_desc&max_price=150')):
+        with recorder.capture(route):
+            guest.get(path)
+    with recorder.capture('add_to_cart'):
+        guest.post('/add_to_cart', json={'product_id': 1, 'quantity': 2})
+    with recorder.capture('send_otp'):
+        guest.post('/send_otp', data={'phone': customer_phone})
+    with app.app_context():
+        challenge, code = otp_store.create_challenge(customer_phone, 'login', None)
+        db.session.commit()
+        challenge_id = challenge.id
+    with guest.session_transaction() as sess:
+        sess['otp_challenge_id'] = challenge_id
+    with recorder.capture('resend_otp'):
+        guest.post('/resend_otp')
+    with app.app_context():
+        # The resend replaced the code; start a fresh challenge to verify
+        challenge, code = otp_store.create_challenge(customer_phone, 'login', None)
+        db.session.commit()
+        challenge_id = challenge.id
+    with guest.session_transaction() as sess:
+        sess['otp_challenge_id'] = challenge_id
+    with recorder.capture('verify_otp'):
+        guest.post('/verify_otp', data={'otp': code})
+
+    customer = app.test_client()
+    login(customer, customer_id)
+    for route, path in (('dashboard', '/dashboard'), ('dashboard?archived=1', '/dashboard?archived=1'),
+                        ('cart', '/cart'), ('get_cart_items', '/get_cart_items')):
+        with recorder.capture(route):
+            customer.get(path)
+    with customer.session_transaction() as sess:
+        sess['cart'] = {'1': {'name': 'Milk', 'price': 80.0, 'quantity': 2}, '12': {'name': 'Cheese', 'price': 130.0, 'quantity': 1}}
+        sess['delivery_info'] = {'address': 'Bole, Addis Ababa', 'phone': customer_phone}
+        sess['payment_info'] = {'method': 'cash_on_delivery', 'details': {}}
+    with recorder.capture('finalize_order'):
+        customer.post('/finalize_order')
+
+    admin = app.test_client()
+    login(admin, admin_id, is_admin=True)
+    for route, path in (('admin', '/admin'), ('admin?archived=1', '/admin?archived=1')):
+        with recorder.capture(route):
+            admin.get(path)
+    with recorder.capture('admin POST'):
+        admin.post('/admin', data={'order_id': recent_orders[0], 'status': 'confirmed'})
+    with recorder.capture('bulk_update_order_status'):
+        admin.post('/admin/orders/status', json={'order_ids': recent_orders[1:], 'status': 'confirmed'})
+
+
+def explain(conn, dialect, sql, parameters):
+    if dialect == 'sqlite':
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).all()
+        depth = {0: -1}
+        plan = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            plan.append('  ' * depth[node_id] + detail)
+        return plan
+    rows = conn.exec_driver_sql(f"EXPLAIN {sql}", parameters).all()
+    return [PG_COSTS.sub('', row[0]) for row in rows]
+
+
+def time_select(conn, sql, parameters, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        conn.exec_driver_sql(sql, parameters).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def analyze_statements(app, recorder, runs):
+    from models import db
+
+    results = OrderedDict()
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        with db.engine.connect() as conn:
+            for key, entry in recorder.statements.items():
+                plan = explain(conn, dialect, entry['sql'], entry['parameters'])
+                if entry['sql'].lstrip().upper().startswith('SELECT'):
+                    ms = time_select(conn, entry['sql'], entry['parameters'], runs)
+                else:
+                    ms = statistics.median(entry['captured_ms'])
+                results[key] = {
+                    'routes': entry['routes'],
+                    'calls': entry['calls'],
+                    'plan': plan,
+                    'full_scans': full_scans(dialect, plan),
+                    'ms': round(ms, 3),
+                }
+            conn.rollback()
+    return dialect, results
+
+
+def print_report(results):
+    print(f"{'routes':<40} {'calls':>5} {'ms':>9}  plan")
+    for key, result in results.items():
+        routes = ','.join(result['routes'])
+        routes = routes if len(routes) <= 40 else routes[:37] + '...'
+        flag = '  <-- full scan' if result['full_scans'] else ''
+        print(f"{routes:<40} {result['calls']:>5} {result['ms']:>9.3f}  {key[:100]}{flag}")
+        for line in result['plan']:
+            print(f"{'':<58}{line}")
+
+
+def compare(baseline, dialect, results, slower_ratio):
+    """Return ``(failures, warnings)`` against a saved baseline."""
+    if baseline['dialect'] != dialect:
+        raise SystemExit(f"Baseline was recorded on {baseline['dialect']}, this run is on {dialect}.")
+    failures, warnings = [], []
+    previous = baseline['queries']
+    for key, result in results.items():
+        before = previous.get(key)
+        if before is None:
+            warnings.append(f"New query ({', '.join(result['routes'])}): {key[:120]}")
+            if result['full_scans']:
+                failures.append(f"New query does a full scan: {result['full_scans']} in {key[:120]}")
+            continue
+        if before['plan'] != result['plan']:
+            failures.append(f"Plan changed for {key[:120]}\n    was: {before['plan']}\n    now: {result['plan']}")
+        new_scans = sorted(set(result['full_scans']) - set(before['full_scans']))
+        if new_scans:
+            failures.append(f"New full scan {new_scans} in {key[:120]}")
+        if result['calls'] > before['calls']:
+            warnings.append(f"Called {result['calls']} times (was {before['calls']}): {key[:120]}")
+        if before['ms'] and result['ms'] > before['ms'] * slower_ratio and result['ms'] - before['ms'] > 1:
+            warnings.append(f"Slower: {before['ms']:.2f} -> {result['ms']:.2f} ms for {key[:120]}")
+    for key in previous:
+        if key not in results:
+            warnings.append(f"Query no longer issued: {key[:120]}")
+    return failures, warnings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='Scratch database to use instead of a temporary SQLite file.')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--runs', type=int, default=5, help='Timed executions per SELECT.')
+    parser.add_argument('--save', metavar='PATH', help='Write the plans and timings as a baseline.')
+    parser.add_argument('--compare', metavar='PATH', help='Compare against a saved baseline.')
+    parser.add_argument('--slower-ratio', type=float, default=1.5, help='Warn when a query gets this much slower.')
+    parser.add_argument('--quiet', action='store_true', help='Only print the comparison.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'plans.db')}"
+        app, counts, admin_id, customer_id, customer_phone, recent_orders = setup_database(
+            database_url, args.users, args.seed)
+        from models import db
+        from sqlalchemy import event
+
+        recorder = Recorder()
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', recorder.before)
+        event.listen(engine, 'after_cursor_execute', recorder.after)
+        drive_routes(app, recorder, admin_id, customer_id, customer_phone, recent_orders)
+        event.remove(engine, 'before_cursor_execute', recorder.before)
+        event.remove(engine, 'after_cursor_execute', recorder.after)
+        dialect, results = analyze_statements(app, recorder, args.runs)
+        with app.app_context():
+            db.engine.dispose()
+
+    if not args.quiet:
+        print(f"{dialect}: {counts['users']} users, {counts['orders']} orders, {counts['order_items']} order items\n")
+        print_report(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'dialect': dialect, 'users': args.users, 'seed': args.seed, 'queries': results}, f, indent=2)
+            f.write('\n')
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        failures, warnings = compare(baseline, dialect, results, args.slower_ratio)
+        print()
+        for warning in warnings:
+            print(f"WARNING {warning}")
+        for failure in failures:
+            print(f"FAIL {failure}")
+        if failures:
+            raise SystemExit(1)
+        print(f"No plan regressions against {args.compare}.")
+
+
+if __name__ == '__main__':
+    main()
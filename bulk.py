@@ -0,0 +1,18 @@
+"""Helpers shared by the bulk writers (catalog sync, cart merge, rate limits, synthetic data)."""
+
+
+def chunks(rows, size):
+    """Yield consecutive slices of ``rows`` of at most ``size`` items."""
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def conflict_insert(table, dialect_name):
+    """An ``INSERT`` into ``table`` that supports ``ON CONFLICT``, or ``None`` on other dialects."""
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(table)
@@ -0,0 +1,92 @@
+"""Merging a guest's session cart into their saved cart at login.
+
+The merge costs two statements whatever the cart size: one SELECT that both
+validates the product ids and fetches the user's existing lines, and one
+bulk upsert on the ``_user_product_uc`` constraint.
+"""
+from sqlalchemy import and_, case, insert, select, update
+
+from bulk import conflict_insert
+from models import db, CartItem, Product
+
+MAX_ITEM_QUANTITY = 99
+
+
+def parse_guest_cart(guest_cart):
+    """Return ``{product_id: quantity}`` from a session cart, dropping malformed lines."""
+    quantities = {}
+    for pid, item in (guest_cart or {}).items():
+        try:
+            product_id = int(pid)
+            quantity = int(item.get('quantity', 1)) if isinstance(item, dict) else int(item)
+        except (TypeError, ValueError):
+            continue
+        if quantity > 0:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def _upsert_statement(dialect_name):
+    stmt = conflict_insert(CartItem.__table__, dialect_name)
+    if stmt is None:
+        return None
+    merged = CartItem.__table__.c.quantity + stmt.excluded.quantity
+    return stmt.on_conflict_do_update(
+        index_elements=['user_id', 'product_id'],
+        set_={'quantity': case((merged > MAX_ITEM_QUANTITY, MAX_ITEM_QUANTITY), else_=merged)}
+    )
+
+
+def merge_guest_cart(user_id, guest_cart):
+    """Add the guest cart's lines to ``user_id``'s cart, capping each line at ``MAX_ITEM_QUANTITY``.
+
+    Lines for unknown products are skipped. The caller commits. Returns
+    ``{'merged': int, 'skipped': [product_id, ...], 'capped': [product_id, ...]}``.
+    """
+    quantities = parse_guest_cart(guest_cart)
+    stats = {'merged': 0, 'skipped': [], 'capped': []}
+    if not quantities:
+        return stats
+
+    rows = db.session.execute(
+        select(Product.id, CartItem.id.label('cart_item_id'), CartItem.quantity)
+        .outerjoin(CartItem, and_(CartItem.product_id == Product.id, CartItem.user_id == user_id))
+        .where(Product.id.in_(quantities))
+    ).all()
+    existing = {row.id: row for row in rows}
+    stats['skipped'] = sorted(pid for pid in quantities if pid not in existing)
+
+    new_lines, updated_lines = [], []
+    for product_id, quantity in sorted(quantities.items()):
+        row = existing.get(product_id)
+        if row is None:
+            continue
+        total = quantity + (row.quantity or 0)
+        if total > MAX_ITEM_QUANTITY:
+            stats['capped'].append(product_id)
+        total = min(total, MAX_ITEM_QUANTITY)
+        if row.cart_item_id is None:
+            new_lines.append({'user_id': user_id, 'product_id': product_id, 'quantity': total})
+        else:
+            updated_lines.append({'id': row.cart_item_id, 'user_id': user_id, 'product_id': product_id,
+                                  'quantity': total, 'added': min(quantity, MAX_ITEM_QUANTITY)})
+    stats['merged'] = len(new_lines) + len(updated_lines)
+    if not stats['merged']:
+        return stats
+
+    upsert = _upsert_statement(db.session.get_bind().dialect.name)
+    if upsert is not None:
+        # Existing lines send only the added quantity; the conflict clause adds it to the stored
+        # value, so a line changed since the SELECT above is still merged correctly
+        lines = new_lines + [
+            {'user_id': line['user_id'], 'product_id': line['product_id'], 'quantity': line['added']}
+            for line in updated_lines
+        ]
+        db.session.execute(upsert, lines)
+    else:
+        if new_lines:
+            db.session.execute(insert(CartItem), new_lines)
+        if updated_lines:
+            db.session.execute(update(CartItem), [{'id': line['id'], 'quantity': line['quantity']}
+                                                  for line in updated_lines])
+    return stats
@@ -0,0 +1,241 @@
+"""Product catalog files, bulk sync into the database and the browse index."""
+import csv
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right
+
+from sqlalchemy import inspect, insert, select, update
+
+from bulk import chunks, conflict_insert
+from models import db, Product, CatalogVersion
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'products.json')
+CATALOG_FIELDS = ('name', 'category', 'price', 'image_path', 'description')
+DEFAULT_CHUNK_SIZE = 500
+BROWSE_SORTS = ('price_asc', 'price_desc', 'name')
+
+
+class CatalogError(ValueError):
+    """Raised when a catalog file cannot be parsed or has invalid rows, or the schema is too old to sync."""
+
+
+def _normalize_row(raw, position):
+    name = (raw.get('name') or '').strip()
+    category = (raw.get('category') or '').strip().lower()
+    if not name or not category:
+        raise CatalogError(f"Row {position}: 'name' and 'category' are required.")
+    try:
+        price = float(raw.get('price'))
+    except (TypeError, ValueError):
+        raise CatalogError(f"Row {position}: invalid price {raw.get('price')!r}.")
+    if price < 0:
+        raise CatalogError(f"Row {position}: price must not be negative.")
+    return {
+        'name': name,
+        'category': category,
+        'price': price,
+        'image_path': (raw.get('image_path') or '').strip() or None,
+        'description': (raw.get('description') or '').strip() or None,
+    }
+
+
+def load_catalog_file(path=DEFAULT_CATALOG_PATH):
+    """Read a ``.json`` or ``.csv`` catalog file into a list of product dicts."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if extension == '.json':
+            raw_rows = json.load(f)
+            if not isinstance(raw_rows, list):
+                raise CatalogError("JSON catalog must be a list of products.")
+        elif extension == '.csv':
+            raw_rows = list(csv.DictReader(f))
+        else:
+            raise CatalogError(f"Unsupported catalog format '{extension}'. Use .json or .csv.")
+
+    rows = []
+    seen = set()
+    for position, raw in enumerate(raw_rows, start=1):
+        row = _normalize_row(raw, position)
+        if row['name'] in seen:
+            raise CatalogError(f"Row {position}: duplicate product name '{row['name']}'.")
+        seen.add(row['name'])
+        rows.append(row)
+    return rows
+
+
+def diff_catalog(rows):
+    """Split catalog rows into inserts, updates (with ``id``) and an unchanged count."""
+    columns = [getattr(Product, field) for field in CATALOG_FIELDS]
+    existing = {
+        row.name: row
+        for row in db.session.execute(select(Product.id, *columns))
+    }
+    to_insert, to_update, unchanged = [], [], 0
+    for row in rows:
+        current = existing.get(row['name'])
+        if current is None:
+            to_insert.append(row)
+        elif all(getattr(current, field) == row[field] for field in CATALOG_FIELDS):
+            unchanged += 1
+        else:
+            to_update.append(dict(row, id=current.id))
+    return to_insert, to_update, unchanged
+
+
+def _has_unique_name(bind):
+    # Databases created by `db.create_all()` before uq_product_name existed lack it,
+    # and ON CONFLICT (name) needs it
+    inspector = inspect(bind)
+    table = Product.__tablename__
+    unique_columns = [c['column_names'] for c in inspector.get_unique_constraints(table)]
+    unique_columns += [i['column_names'] for i in inspector.get_indexes(table) if i['unique']]
+    return ['name'] in unique_columns
+
+
+def _upsert_statement(bind):
+    if not _has_unique_name(bind):
+        return None
+    stmt = conflict_insert(Product.__table__, bind.dialect.name)
+    if stmt is None:
+        return None
+    return stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={field: stmt.excluded[field] for field in CATALOG_FIELDS if field != 'name'}
+    )
+
+
+def get_catalog_version():
+    row = db.session.get(CatalogVersion, 1)
+    return row.version if row else 0
+
+
+def bump_catalog_version():
+    result = db.session.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.session.add(CatalogVersion(id=1, version=1))
+        db.session.flush()
+
+
+def sync_catalog(rows, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """Apply ``rows`` to the product table with chunked bulk upserts.
+
+    Products missing from ``rows`` are left alone so historical order items
+    keep pointing at them. Returns the inserted/updated/unchanged counts and
+    the resulting catalog version.
+    """
+    if not inspect(db.session.get_bind()).has_table(CatalogVersion.__tablename__):
+        raise CatalogError("The database schema is out of date (no catalog_version table); "
+                           "run `flask db upgrade`, or `flask init-db` for a local SQLite file, first.")
+    to_insert, to_update, unchanged = diff_catalog(rows)
+    stats = {'inserted': len(to_insert), 'updated': len(to_update), 'unchanged': unchanged}
+    if dry_run or not (to_insert or to_update):
+        db.session.rollback()
+        stats['version'] = get_catalog_version()
+        return stats
+
+    try:
+        upsert = _upsert_statement(db.session.get_bind())
+        if upsert is not None:
+            changed = to_insert + [{field: row[field] for field in CATALOG_FIELDS} for row in to_update]
+            for chunk in chunks(changed, chunk_size):
+                db.session.execute(upsert, chunk)
+        else:
+            for chunk in chunks(to_insert, chunk_size):
+                db.session.execute(insert(Product), chunk)
+            for chunk in chunks(to_update, chunk_size):
+                db.session.execute(update(Product), chunk)
+        bump_catalog_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    stats['version'] = get_catalog_version()
+    return stats
+
+
+class CatalogIndex:
+    """Products pre-sorted per category, so browsing never hits the database.
+
+    ``by_price`` holds every category's products in ascending price order
+    (``None`` is the whole catalog), with a parallel list of prices so price
+    ranges are two bisections. ``by_name`` is the same per category in name
+    order.
+    """
+
+    def __init__(self, products, version):
+        self.version = version
+        self.by_price = {None: sorted(products, key=lambda p: (p['price'], p['name']))}
+        for product in self.by_price[None]:
+            self.by_price.setdefault(product['category'], []).append(product)
+        self.prices = {category: [p['price'] for p in rows] for category, rows in self.by_price.items()}
+        self.by_name = {category: sorted(rows, key=lambda p: p['name']) for category, rows in self.by_price.items()}
+        self.categories = sorted(category for category in self.by_price if category is not None)
+
+    def _price_slice(self, category, min_price, max_price):
+        prices = self.prices[category]
+        start = 0 if min_price is None else bisect_left(prices, min_price)
+        end = len(prices) if max_price is None else bisect_right(prices, max_price)
+        return start, max(start, end)
+
+    def facets(self, min_price=None, max_price=None):
+        """Product count per category within the price range."""
+        counts = {}
+        for category in self.categories:
+            start, end = self._price_slice(category, min_price, max_price)
+            counts[category] = end - start
+        return counts
+
+    def query(self, category=None, min_price=None, max_price=None, sort='price_asc', page=1, per_page=24):
+        """Return ``(products_on_page, total_matching)``."""
+        if category not in self.by_price:
+            return [], 0
+        start, end = self._price_slice(category, min_price, max_price)
+        offset = (page - 1) * per_page
+        if sort == 'price_asc':
+            rows = self.by_price[category][start:end]
+            return rows[offset:offset + per_page], end - start
+        if sort == 'price_desc':
+            rows = self.by_price[category][start:end][::-1]
+            return rows[offset:offset + per_page], end - start
+        if min_price is None and max_price is None:
+            rows = self.by_name[category]
+        else:
+            rows = [p for p in self.by_name[category]
+                    if (min_price is None or p['price'] >= min_price) and (max_price is None or p['price'] <= max_price)]
+        return rows[offset:offset + per_page], len(rows)
+
+
+_index = None
+_index_lock = threading.Lock()
+index_stats = {'hits': 0, 'rebuilds': 0}
+
+
+def get_catalog_index():
+    """Return the browse index, rebuilding it when the catalog version has moved on."""
+    global _index
+    version = get_catalog_version()
+    index = _index
+    if index is not None and index.version == version:
+        index_stats['hits'] += 1
+        return index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            index_stats['rebuilds'] += 1
+            products = [
+                {
+                    'id': product.id,
+                    'name': product.name,
+                    'category': product.category,
+                    'price': product.price,
+                    'image_path': product.image_path,
+                    'description': product.description,
+                }
+                for product in Product.query.all()
+            ]
+            _index = CatalogIndex(products, version)
+        return _index
@@ -0,0 +1,162 @@
+"""gzip/brotli response compression.
+
+Brotli is used when the optional ``brotli`` package is installed and the
+client accepts it, otherwise gzip. Small bodies, non-text content types and
+streamed responses (e.g. static files) are passed through untouched.
+
+Identical bodies are only compressed once: compressed variants are kept in
+a small LRU keyed by a digest of the uncompressed body, so cacheable
+responses such as the catalog page or repeated searches reuse the stored
+bytes.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+)
+
+
+def parse_accept_encoding(header):
+    """Return the set of codings with a non-zero q-value."""
+    accepted = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def compress_body(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies bounded by total compressed size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class Compress:
+    def __init__(self, app=None):
+        self.cache = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BR_LEVEL', 4)
+        app.config.setdefault('COMPRESS_CACHE_BYTES', 4 * 1024 * 1024)
+        self.cache = CompressedBodyCache(app.config['COMPRESS_CACHE_BYTES'])
+        app.extensions['compress'] = self
+        app.after_request(self.after_request)
+
+    def choose_encoding(self, accept_encoding):
+        accepted = parse_accept_encoding(accept_encoding)
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def compress(self, data, encoding, config):
+        level = config['COMPRESS_BR_LEVEL'] if encoding == 'br' else config['COMPRESS_GZIP_LEVEL']
+        key = (encoding, level, hashlib.blake2b(data, digest_size=16).digest())
+        body = self.cache.get(key)
+        if body is None:
+            body = compress_body(data, encoding, level)
+            self.cache.put(key, body)
+        return body
+
+    def after_request(self, response):
+        config = current_app.config
+        if not config['COMPRESS_ENABLED'] or response.mimetype not in config['COMPRESS_MIMETYPES']:
+            return response
+        # Whatever we decide below, the body depends on Accept-Encoding
+        response.vary.add('Accept-Encoding')
+        if (response.direct_passthrough
+                or response.is_streamed
+                or not 200 <= response.status_code < 300
+                or response.status_code == 204
+                or 'Content-Encoding' in response.headers
+                or 'Content-Range' in response.headers):
+            return response
+        encoding = self.choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+
+        body = self.compress(data, encoding, config)
+        if len(body) >= len(data):
+            return response
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if response.headers.get('ETag'):
+            # A strong ETag must differ between encodings of the same resource
+            etag, weak = response.get_etag()
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+        return response
+
+
+compress = Compress()
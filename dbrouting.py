@@ -0,0 +1,69 @@
+"""Read/write splitting between the primary database and a read replica.
+
+Views opt in with ``@db_router.replica_reads``; their GET requests read
+from the ``replica`` bind when ``DATABASE_REPLICA_URL`` is set. Everything
+else, and any flush, DML statement or ``SELECT ... FOR UPDATE``, goes to the
+primary.
+
+After a request writes, the browser session is pinned to the primary for
+``DB_REPLICA_STICKY_SECONDS`` so the next pages (e.g. the dashboard after
+placing an order) see that write even if the replica lags behind.
+"""
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+STICKY_SESSION_KEY = 'db_primary_until'
+READ_METHODS = frozenset(('GET', 'HEAD'))
+
+
+def is_write(session, clause):
+    if session._flushing or isinstance(clause, UpdateBase):
+        return True
+    return getattr(clause, '_for_update_arg', None) is not None
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and 'db_use_replica' in g:
+            if is_write(self, clause):
+                db_router.note_write()
+            elif g.db_use_replica:
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class DatabaseRouter:
+    def init_app(self, app):
+        app.config.setdefault('DB_REPLICA_STICKY_SECONDS', 10)
+        app.extensions['db_router'] = self
+        if REPLICA_BIND in app.config.get('SQLALCHEMY_BINDS', {}):
+            app.before_request(self._route_request)
+            app.after_request(self._pin_after_write)
+
+    def replica_reads(self, f):
+        f._replica_reads = True
+        return f
+
+    def note_write(self):
+        g.db_use_replica = False
+        g.db_wrote = True
+
+    def _route_request(self):
+        view = current_app.view_functions.get(request.endpoint)
+        g.db_use_replica = (
+            request.method in READ_METHODS
+            and getattr(view, '_replica_reads', False)
+            and session.get(STICKY_SESSION_KEY, 0) < time.time()
+        )
+
+    def _pin_after_write(self, response):
+        if g.get('db_wrote'):
+            session[STICKY_SESSION_KEY] = time.time() + current_app.config['DB_REPLICA_STICKY_SECONDS']
+        return response
+
+
+db_router = DatabaseRouter()
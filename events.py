@@ -0,0 +1,262 @@
+"""Order events pushed to browsers over Server-Sent Events.
+
+Views publish to named channels; each open ``EventSource`` connection
+subscribes to the channels it may see. Fan-out goes through a backend:
+
+* ``memory`` (default): in-process queues, enough for a single worker.
+* ``postgres``: PostgreSQL ``LISTEN/NOTIFY``, so an event published by one
+  worker reaches streams held open by the others.
+"""
+import json
+import queue
+import threading
+import time
+
+from bulk import chunks
+from models import TRACKER_STATUSES
+from order_status import status_label
+
+ADMIN_CHANNEL = 'orders:admin'
+POSTGRES_NOTIFY_CHANNEL = 'baba_order_events'
+# Order ids per status event, keeping a pg_notify payload well under its 8000-byte limit
+STATUS_EVENT_BATCH = 500
+
+
+def user_channel(user_id):
+    return f'orders:user:{user_id}'
+
+
+def format_sse(event, data):
+    lines = [f'event: {event}']
+    for line in json.dumps(data).splitlines():
+        lines.append(f'data: {line}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    def __init__(self, backend, channels, maxsize):
+        self.backend = backend
+        self.channels = tuple(channels)
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class InProcessBackend:
+    """Fan-out to subscribers in this process.
+
+    Slow consumers never block publishers: when a subscriber's queue is full
+    the event is dropped for that subscriber only.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}  # channel -> set of Subscription
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                pass
+
+    def publish_many(self, messages):
+        """Publish ``(channel, message)`` pairs."""
+        for channel, message in messages:
+            self.publish(channel, message)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+
+class PostgresNotifyBackend(InProcessBackend):
+    """Publishes with ``pg_notify`` and fans out locally from a listener thread."""
+
+    def __init__(self, engine, queue_size=100):
+        super().__init__(queue_size)
+        self.engine = engine
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, channels):
+        self._ensure_listener()
+        return super().subscribe(channels)
+
+    def publish(self, channel, message):
+        self.publish_many([(channel, message)])
+
+    def publish_many(self, messages):
+        # One transaction for the whole batch rather than one per message
+        from sqlalchemy import text
+        params = [
+            {'name': POSTGRES_NOTIFY_CHANNEL, 'payload': json.dumps({'channel': channel, 'message': message})}
+            for channel, message in messages
+        ]
+        if not params:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:name, :payload)"), params)
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='order-events-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        import select
+        while True:
+            try:
+                raw = self.engine.raw_connection()
+                try:
+                    dbapi_conn = raw.driver_connection
+                    dbapi_conn.autocommit = True
+                    with dbapi_conn.cursor() as cursor:
+                        cursor.execute(f"LISTEN {POSTGRES_NOTIFY_CHANNEL}")
+                    while True:
+                        if select.select([dbapi_conn], [], [], 30) == ([], [], []):
+                            continue
+                        dbapi_conn.poll()
+                        while dbapi_conn.notifies:
+                            notify = dbapi_conn.notifies.pop(0)
+                            event = json.loads(notify.payload)
+                            InProcessBackend.publish(self, event['channel'], event['message'])
+                finally:
+                    raw.invalidate()
+            except Exception:
+                time.sleep(5)
+
+
+class OrderEvents:
+    def __init__(self):
+        self.backend = None
+        self._streams = 0
+        self._streams_lock = threading.Lock()
+
+    def init_app(self, app, backend=None):
+        app.config.setdefault('SSE_BACKEND', 'memory')
+        app.config.setdefault('SSE_MAX_STREAMS', 8)
+        app.config.setdefault('SSE_KEEPALIVE_SECONDS', 15)
+        app.config.setdefault('SSE_STREAM_SECONDS', 300)
+        # Reconnect delay for browsers turned away because SSE_MAX_STREAMS are open
+        app.config.setdefault('SSE_BUSY_RETRY_SECONDS', 30)
+        if backend is None:
+            if app.config['SSE_BACKEND'] == 'postgres':
+                from models import db
+                with app.app_context():
+                    backend = PostgresNotifyBackend(db.engine)
+            elif app.config['SSE_BACKEND'] == 'memory':
+                backend = InProcessBackend()
+            else:
+                raise ValueError(f"Unknown SSE_BACKEND '{app.config['SSE_BACKEND']}'.")
+        self.backend = backend
+        app.extensions['order_events'] = self
+
+    def publish(self, channel, event, data):
+        self.publish_many([(channel, event, data)])
+
+    def publish_many(self, events):
+        """Publish ``(channel, event, data)`` triples in one backend call."""
+        try:
+            self.backend.publish_many([(channel, {'event': event, 'data': data}) for channel, event, data in events])
+        except Exception:
+            # Live updates are best effort; the page still shows fresh data on reload
+            pass
+
+    def publish_status(self, updated, status):
+        """Announce that the ``(order_id, user_id)`` pairs in ``updated`` moved to ``status``.
+
+        Sends one ``order_status`` event with all the ids to the admin channel
+        and one per customer with their own ids, so a bulk change of hundreds
+        of orders cannot overflow a subscriber's queue.
+        """
+        common = {
+            'status': status,
+            'status_label': status_label(status),
+            'current_status_index': TRACKER_STATUSES.index(status) if status in TRACKER_STATUSES else -1,
+        }
+        by_user = {}
+        for order_id, user_id in updated:
+            if user_id:
+                by_user.setdefault(user_id, []).append(order_id)
+        events = [
+            (ADMIN_CHANNEL, 'order_status', dict(common, order_ids=batch))
+            for batch in chunks([order_id for order_id, _ in updated], STATUS_EVENT_BATCH)
+        ]
+        events += [
+            (user_channel(user_id), 'order_status', dict(common, order_ids=batch))
+            for user_id, order_ids in by_user.items()
+            for batch in chunks(order_ids, STATUS_EVENT_BATCH)
+        ]
+        self.publish_many(events)
+
+    def publish_created(self, data):
+        self.publish(ADMIN_CHANNEL, 'order_created', data)
+
+    def try_open_stream(self, max_streams):
+        """Reserve one of ``max_streams`` slots; release it with ``close_stream``."""
+        with self._streams_lock:
+            if self._streams >= max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._streams_lock:
+            self._streams -= 1
+
+    @property
+    def open_streams(self):
+        return self._streams
+
+    def stream(self, channels, keepalive, duration):
+        """Yield SSE frames for ``channels`` until ``duration`` seconds have passed.
+
+        The client's ``EventSource`` reconnects on its own afterwards, which
+        keeps a worker thread from being held by one browser forever.
+        """
+        yield 'retry: 3000\n\n'
+        subscription = self.backend.subscribe(channels)
+        deadline = time.monotonic() + duration
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                message = subscription.get(timeout=min(keepalive, remaining))
+                if message is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield format_sse(message['event'], message['data'])
+        finally:
+            subscription.close()
+
+
+order_events = OrderEvents()
@@ -0,0 +1,48 @@
+"""SQLite autoincrement order ids
+
+Revision ID: 18e6690f5133
+Revises: 7c07dded6fe1
+Create Date: 2026-10-19 04:37:02.052764
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '18e6690f5133'
+down_revision = '7c07dded6fe1'
+branch_labels = None
+depends_on = None
+
+
+# Hot tables whose rows are copied with their ids into the archive tables
+TABLES = (('order', 'order_archive'), ('order_item', 'order_item_archive'),
+          ('order_status_change', 'order_status_change_archive'))
+
+
+def upgrade():
+    # Without AUTOINCREMENT SQLite reuses the ids of deleted (archived) rows, which then
+    # collide in the archive tables. PostgreSQL sequences never go back, so nothing to do there.
+    conn = op.get_bind()
+    if conn.dialect.name != 'sqlite':
+        return
+    for table, archive_table in TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        highest = conn.execute(sa.text(
+            f'SELECT max(id) FROM (SELECT id FROM "{table}" UNION ALL SELECT id FROM {archive_table})'
+        )).scalar()
+        if highest:
+            conn.execute(sa.text('DELETE FROM sqlite_sequence WHERE name = :name'), {'name': table})
+            conn.execute(sa.text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)'),
+                         {'name': table, 'seq': highest})
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != 'sqlite':
+        return
+    for table, _ in TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
@@ -0,0 +1,35 @@
+"""Rate limit buckets
+
+Revision ID: 1c29f53366d9
+Revises: 6188d94a531d
+Create Date: 2026-10-19 04:07:39.820132
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c29f53366d9'
+down_revision = '6188d94a531d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rate_limit_bucket',
+    sa.Column('key', sa.String(length=200), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.Float(), nullable=False),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('rate_limit_bucket', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_rate_limit_bucket_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('rate_limit_bucket', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_rate_limit_bucket_expires_at'))
+
+    op.drop_table('rate_limit_bucket')
@@ -0,0 +1,45 @@
+"""Order status audit
+
+Revision ID: 300ce501ceb9
+Revises: e353ed3bf968
+Create Date: 2026-10-19 04:13:51.811669
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '300ce501ceb9'
+down_revision = 'e353ed3bf968'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_status_change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('from_status', sa.String(length=50), nullable=True),
+    sa.Column('to_status', sa.String(length=50), nullable=False),
+    sa.Column('changed_by', sa.Integer(), nullable=True),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['changed_by'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_status_change', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_status_change_order_id'), ['order_id'], unique=False)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_status'), ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_status'))
+
+    with op.batch_alter_table('order_status_change', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_status_change_order_id'))
+
+    op.drop_table('order_status_change')
@@ -0,0 +1,35 @@
+"""Product name unique and catalog version
+
+Revision ID: 6188d94a531d
+Revises: c14292ac19f5
+Create Date: 2026-10-19 04:06:21.608860
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6188d94a531d'
+down_revision = 'c14292ac19f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_product_name', ['name'])
+
+    op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('catalog_version')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_product_name', type_='unique')
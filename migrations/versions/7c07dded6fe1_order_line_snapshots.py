@@ -0,0 +1,76 @@
+"""Order line snapshots
+
+Revision ID: 7c07dded6fe1
+Revises: ba0e38ba749c
+Create Date: 2026-10-19 04:18:41.798042
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c07dded6fe1'
+down_revision = 'ba0e38ba749c'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 1000
+
+# (order table, order item table) pairs that get the snapshot columns
+TABLES = (('order', 'order_item'), ('order_archive', 'order_item_archive'))
+
+
+def backfill(conn, order_table, item_table):
+    """Fill product_name and items_summary for existing orders, BATCH_SIZE orders at a time."""
+    product = sa.table('product', sa.column('id'), sa.column('name'))
+    orders = sa.table(order_table, sa.column('id'), sa.column('items_summary'))
+    items = sa.table(item_table, sa.column('id'), sa.column('order_id'), sa.column('product_id'),
+                     sa.column('product_name'), sa.column('quantity'))
+    set_name = (items.update().where(items.c.id == sa.bindparam('b_id'))
+                .values(product_name=sa.bindparam('b_name')))
+    set_summary = (orders.update().where(orders.c.id == sa.bindparam('b_id'))
+                   .values(items_summary=sa.bindparam('b_summary')))
+
+    last_id = 0
+    while True:
+        order_ids = conn.execute(
+            sa.select(orders.c.id).where(orders.c.id > last_id).order_by(orders.c.id).limit(BATCH_SIZE)
+        ).scalars().all()
+        if not order_ids:
+            return
+        rows = conn.execute(
+            sa.select(items.c.id, items.c.order_id, items.c.quantity, product.c.name)
+            .join(product, product.c.id == items.c.product_id)
+            .where(items.c.order_id.in_(order_ids))
+            .order_by(items.c.order_id, items.c.id)
+        ).all()
+        lines = {}
+        for row in rows:
+            lines.setdefault(row.order_id, []).append(f"{row.name} (x{row.quantity})")
+        if rows:
+            conn.execute(set_name, [{'b_id': row.id, 'b_name': row.name} for row in rows])
+        conn.execute(set_summary, [{'b_id': order_id, 'b_summary': ", ".join(lines.get(order_id, []))}
+                                   for order_id in order_ids])
+        last_id = order_ids[-1]
+
+
+def upgrade():
+    for order_table, item_table in TABLES:
+        with op.batch_alter_table(order_table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('items_summary', sa.Text(), nullable=True))
+        with op.batch_alter_table(item_table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('product_name', sa.String(length=100), nullable=True))
+
+    conn = op.get_bind()
+    for order_table, item_table in TABLES:
+        backfill(conn, order_table, item_table)
+
+
+def downgrade():
+    for order_table, item_table in reversed(TABLES):
+        with op.batch_alter_table(item_table, schema=None) as batch_op:
+            batch_op.drop_column('product_name')
+        with op.batch_alter_table(order_table, schema=None) as batch_op:
+            batch_op.drop_column('items_summary')
@@ -0,0 +1,86 @@
+"""Order archive tables
+
+Revision ID: ba0e38ba749c
+Revises: 300ce501ceb9
+Create Date: 2026-10-19 04:16:14.040098
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ba0e38ba749c'
+down_revision = '300ce501ceb9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_archive',
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_date', sa.DateTime(), nullable=True),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('delivery_address', sa.String(length=255), nullable=False),
+    sa.Column('delivery_phone', sa.String(length=20), nullable=False),
+    sa.Column('payment_method', sa.String(length=50), nullable=False),
+    sa.Column('payment_details', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_archive_status'), ['status'], unique=False)
+        batch_op.create_index('ix_order_archive_user_id', ['user_id'], unique=False)
+
+    op.create_table('order_item_archive',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price_at_purchase', sa.Float(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['order_archive.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_item_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_item_archive_order_id'), ['order_id'], unique=False)
+
+    op.create_table('order_status_change_archive',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('from_status', sa.String(length=50), nullable=True),
+    sa.Column('to_status', sa.String(length=50), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.Column('changed_by', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['changed_by'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['order_id'], ['order_archive.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_status_change_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_status_change_archive_order_id'), ['order_id'], unique=False)
+
+    # The archive job deletes order items by order id
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_item_order_id'), ['order_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_item_order_id'))
+
+    with op.batch_alter_table('order_status_change_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_status_change_archive_order_id'))
+
+    op.drop_table('order_status_change_archive')
+    with op.batch_alter_table('order_item_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_item_archive_order_id'))
+
+    op.drop_table('order_item_archive')
+    with op.batch_alter_table('order_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_archive_user_id')
+        batch_op.drop_index(batch_op.f('ix_order_archive_status'))
+
+    op.drop_table('order_archive')
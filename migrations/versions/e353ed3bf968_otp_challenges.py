@@ -0,0 +1,41 @@
+"""OTP challenges
+
+Revision ID: e353ed3bf968
+Revises: 1c29f53366d9
+Create Date: 2026-10-19 04:08:52.034588
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e353ed3bf968'
+down_revision = '1c29f53366d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('otp_challenge',
+    sa.Column('id', sa.String(length=64), nullable=False),
+    sa.Column('phone', sa.String(length=20), nullable=False),
+    sa.Column('code_hash', sa.String(length=64), nullable=False),
+    sa.Column('action_type', sa.String(length=10), nullable=False),
+    sa.Column('signup_name', sa.String(length=100), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('otp_challenge', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_otp_challenge_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_otp_challenge_phone'), ['phone'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('otp_challenge', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_otp_challenge_phone'))
+        batch_op.drop_index(batch_op.f('ix_otp_challenge_expires_at'))
+
+    op.drop_table('otp_challenge')
@@ -0,0 +1,182 @@
+from datetime import datetime
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import declared_attr
+from dbrouting import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    phone = db.Column(db.String(20), unique=True, nullable=False)
+    password = db.Column(db.String(255), nullable=False)  # ✅ Add this line
+    is_admin = db.Column(db.Boolean, default=False)
+    address = db.Column(db.String(200), nullable=True)
+    orders = db.relationship('Order', backref='customer', lazy=True)
+
+class Product(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    image_path = db.Column(db.String(100), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    __table_args__ = (db.UniqueConstraint('name', name='uq_product_name'),)
+
+class CatalogVersion(db.Model):
+    # Single row, bumped whenever the product catalog changes so caches can invalidate
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CartItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, default=1)
+    user = db.relationship('User', backref='cart_items')
+    product = db.relationship('Product')
+    __table_args__ = (db.UniqueConstraint('user_id', 'product_id', name='_user_product_uc'),)
+
+# Order status state machine. Tracker statuses are the delivery steps shown to
+# customers, in order; an order may move forward any number of steps.
+TRACKER_STATUSES = ('placed', 'confirmed', 'packed', 'out_for_delivery', 'delivered')
+PENDING_PAYMENT_STATUSES = ('pending_payment_telebirr', 'pending_payment_cbebirr')
+ORDER_STATUSES = TRACKER_STATUSES[:1] + PENDING_PAYMENT_STATUSES + TRACKER_STATUSES[1:] + ('cancelled',)
+
+def _build_transitions():
+    transitions = {}
+    for status in PENDING_PAYMENT_STATUSES:
+        transitions[status] = set(TRACKER_STATUSES) | {'cancelled'}
+    for index, status in enumerate(TRACKER_STATUSES):
+        transitions[status] = set(TRACKER_STATUSES[index + 1:])
+        if status != 'delivered':
+            transitions[status].add('cancelled')
+    transitions['cancelled'] = set()
+    return {status: frozenset(targets) for status, targets in transitions.items()}
+
+ORDER_TRANSITIONS = _build_transitions()
+
+def format_items_summary(lines):
+    """Format ``(product_name, quantity)`` pairs for order listings."""
+    return ", ".join(f"{name} (x{quantity})" for name, quantity in lines)
+
+class OrderColumns:
+    # Shared by the hot order table and its archive
+    id = db.Column(db.Integer, primary_key=True)
+    order_date = db.Column(db.DateTime, default=datetime.utcnow)
+    total_amount = db.Column(db.Float, nullable=False)
+    delivery_address = db.Column(db.String(255), nullable=False)
+    delivery_phone = db.Column(db.String(20), nullable=False)
+    payment_method = db.Column(db.String(50), nullable=False)
+    payment_details = db.Column(db.JSON, nullable=True)
+    status = db.Column(db.String(50), default='placed', index=True)
+    # "Name (xQty), ..." written once when the order is placed, so listings never touch order_item/product
+    items_summary = db.Column(db.Text, nullable=True)
+
+    @declared_attr
+    def user_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    @property
+    def items(self):
+        if self.items_summary is not None:
+            return self.items_summary
+        return format_items_summary((item.name, item.quantity) for item in self.order_items)
+
+    @property
+    def date(self):
+        return self.order_date.strftime('%Y-%m-%d %H:%M')
+
+    @property
+    def tracker_statuses(self):
+        return TRACKER_STATUSES
+
+    @property
+    def current_status_index(self):
+        try:
+            return self.tracker_statuses.index(self.status)
+        except ValueError:
+            return -1
+
+class OrderItemColumns:
+    id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    price_at_purchase = db.Column(db.Float, nullable=False)
+    # Product name (which includes the unit, e.g. "Fresh Cow Milk (1L)") at purchase time
+    product_name = db.Column(db.String(100), nullable=True)
+
+    @declared_attr
+    def product_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+
+    @declared_attr
+    def product(cls):
+        return db.relationship('Product')
+
+    @property
+    def name(self):
+        return self.product_name if self.product_name is not None else self.product.name
+
+class OrderStatusChangeColumns:
+    id = db.Column(db.Integer, primary_key=True)
+    from_status = db.Column(db.String(50), nullable=True)
+    to_status = db.Column(db.String(50), nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @declared_attr
+    def changed_by(cls):
+        return db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+
+# Archived rows keep their ids, so SQLite must never hand out the id of a deleted (archived) row again
+NO_ID_REUSE = {'sqlite_autoincrement': True}
+
+class Order(OrderColumns, db.Model):
+    __table_args__ = NO_ID_REUSE
+
+class OrderItem(OrderItemColumns, db.Model):
+    __table_args__ = NO_ID_REUSE
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    order = db.relationship('Order', backref='order_items')
+
+class OrderStatusChange(OrderStatusChangeColumns, db.Model):
+    # Audit trail of admin status changes
+    __table_args__ = NO_ID_REUSE
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+
+# Cold storage for delivered/cancelled orders, filled by `flask archive-orders`
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+
+class ArchivedOrder(OrderColumns, db.Model):
+    __tablename__ = 'order_archive'
+    # Archived orders are only ever listed per customer
+    __table_args__ = (db.Index('ix_order_archive_user_id', 'user_id'),)
+    archived_at = db.Column(db.DateTime, server_default=db.func.now())
+    customer = db.relationship('User')
+
+class ArchivedOrderItem(OrderItemColumns, db.Model):
+    __tablename__ = 'order_item_archive'
+    order_id = db.Column(db.Integer, db.ForeignKey('order_archive.id'), nullable=False, index=True)
+    order = db.relationship('ArchivedOrder', backref='order_items')
+
+class ArchivedOrderStatusChange(OrderStatusChangeColumns, db.Model):
+    __tablename__ = 'order_status_change_archive'
+    order_id = db.Column(db.Integer, db.ForeignKey('order_archive.id'), nullable=False, index=True)
+
+class RateLimitBucket(db.Model):
+    # Token buckets for the shared rate-limit backend; times are Unix timestamps
+    key = db.Column(db.String(200), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
+
+class OtpChallenge(db.Model):
+    # One pending OTP per phone; the id is an unguessable token kept in the session
+    id = db.Column(db.String(64), primary_key=True)
+    phone = db.Column(db.String(20), nullable=False, index=True)
+    code_hash = db.Column(db.String(64), nullable=False)
+    action_type = db.Column(db.String(10), nullable=False)
+    signup_name = db.Column(db.String(100), nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
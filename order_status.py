@@ -0,0 +1,105 @@
+"""Validated, set-based order status changes with an audit trail."""
+from datetime import datetime
+
+from sqlalchemy import insert, select, update
+
+from models import db, Order, OrderStatusChange, ORDER_STATUSES, ORDER_TRANSITIONS
+
+MAX_BULK_ORDERS = 1000
+
+STATUS_LABELS = {
+    'pending_payment_telebirr': 'Payment Pending (Telebirr)',
+    'pending_payment_cbebirr': 'Payment Pending (CBE Birr)',
+}
+
+
+class StatusChangeError(ValueError):
+    """Raised for an unknown status or an unusable list of order ids."""
+
+
+def status_label(status):
+    return STATUS_LABELS.get(status, status.replace('_', ' ').capitalize())
+
+
+def can_transition(from_status, to_status):
+    return to_status in ORDER_TRANSITIONS.get(from_status, ())
+
+
+def source_statuses(to_status):
+    """Statuses an order may be in to move to ``to_status``."""
+    return sorted(status for status, targets in ORDER_TRANSITIONS.items() if to_status in targets)
+
+
+def transition_orders(order_ids, new_status, changed_by=None):
+    """Move every eligible order in ``order_ids`` to ``new_status``.
+
+    Runs one guarded ``UPDATE ... WHERE id IN (...) AND status IN (...)`` and
+    one batched insert of audit rows, then commits. Returns ``updated`` as a
+    list of ``(order_id, user_id)`` tuples, ``rejected`` as a list of
+    ``(order_id, current_status)`` tuples and ``missing`` order ids.
+    """
+    if new_status not in ORDER_STATUSES:
+        raise StatusChangeError(f"Unknown status '{new_status}'.")
+    # A string would be iterated character by character ("12" -> orders 1 and 2)
+    if isinstance(order_ids, (str, bytes)) or any(isinstance(order_id, bool) for order_id in order_ids):
+        raise StatusChangeError("Order ids must be integers.")
+    try:
+        order_ids = sorted({int(order_id) for order_id in order_ids})
+    except (TypeError, ValueError):
+        raise StatusChangeError("Order ids must be integers.")
+    if not order_ids:
+        raise StatusChangeError("No orders selected.")
+    if len(order_ids) > MAX_BULK_ORDERS:
+        raise StatusChangeError(f"At most {MAX_BULK_ORDERS} orders can be changed at once.")
+
+    sources = source_statuses(new_status)
+    try:
+        current = {
+            row.id: row
+            for row in db.session.execute(
+                select(Order.id, Order.user_id, Order.status)
+                .where(Order.id.in_(order_ids))
+                .with_for_update()
+            )
+        }
+        eligible = [order_id for order_id, row in current.items() if row.status in sources]
+        updated_ids = set()
+        if eligible:
+            stmt = (
+                update(Order)
+                .where(Order.id.in_(eligible), Order.status.in_(sources))
+                .values(status=new_status)
+                .execution_options(synchronize_session=False)
+            )
+            if db.session.get_bind().dialect.update_returning:
+                updated_ids = {row.id for row in db.session.execute(stmt.returning(Order.id))}
+            else:
+                # Rows are locked by the SELECT ... FOR UPDATE above
+                db.session.execute(stmt)
+                updated_ids = set(eligible)
+            now = datetime.utcnow()
+            audit_rows = [
+                {
+                    'order_id': order_id,
+                    'from_status': current[order_id].status,
+                    'to_status': new_status,
+                    'changed_by': changed_by,
+                    'changed_at': now,
+                }
+                for order_id in sorted(updated_ids)
+            ]
+            if audit_rows:
+                db.session.execute(insert(OrderStatusChange), audit_rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Orders loaded earlier in this session would otherwise keep their old status
+    db.session.expire_all()
+    return {
+        'updated': [(order_id, current[order_id].user_id) for order_id in sorted(updated_ids)],
+        'rejected': [(order_id, current[order_id].status) for order_id in order_ids
+                     if order_id in current and order_id not in updated_ids],
+        'missing': [order_id for order_id in order_ids if order_id not in current],
+    }
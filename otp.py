@@ -0,0 +1,93 @@
+"""Server-side OTP challenges.
+
+Only the challenge id is stored in the session cookie; the code itself is
+kept as an HMAC keyed with the app secret, so it never reaches the client.
+"""
+import hashlib
+import hmac
+import secrets
+import string
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete
+
+from models import db, OtpChallenge
+
+OTP_LENGTH = 6
+OTP_TTL = timedelta(minutes=5)
+MAX_ATTEMPTS = 5
+PURGE_INTERVAL = 600  # seconds between opportunistic purges, per process
+
+_purge_lock = threading.Lock()
+_next_purge = 0.0
+
+
+def generate_code():
+    return ''.join(secrets.choice(string.digits) for _ in range(OTP_LENGTH))
+
+
+def hash_code(challenge_id, code):
+    key = current_app.secret_key.encode('utf-8')
+    return hmac.new(key, f"{challenge_id}:{code}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def create_challenge(phone, action_type, signup_name=None):
+    """Replace any pending challenge for ``phone``; returns ``(challenge, code)``."""
+    db.session.execute(delete(OtpChallenge).where(OtpChallenge.phone == phone))
+    challenge = OtpChallenge(
+        id=secrets.token_urlsafe(32),
+        phone=phone,
+        action_type=action_type,
+        signup_name=signup_name,
+        attempts=0
+    )
+    code = refresh_code(challenge)
+    db.session.add(challenge)
+    return challenge, code
+
+
+def refresh_code(challenge):
+    code = generate_code()
+    challenge.code_hash = hash_code(challenge.id, code)
+    challenge.expires_at = datetime.utcnow() + OTP_TTL
+    challenge.attempts = 0
+    return code
+
+
+def get_challenge(challenge_id):
+    if not challenge_id:
+        return None
+    return db.session.get(OtpChallenge, challenge_id)
+
+
+def is_expired(challenge):
+    return challenge.expires_at <= datetime.utcnow()
+
+
+def check_code(challenge, code):
+    """Compare ``code`` against the challenge, counting failed attempts."""
+    if hmac.compare_digest(challenge.code_hash, hash_code(challenge.id, code)):
+        return True
+    challenge.attempts += 1
+    return False
+
+
+def purge_expired():
+    result = db.session.execute(delete(OtpChallenge).where(OtpChallenge.expires_at <= datetime.utcnow()))
+    return result.rowcount
+
+
+def maybe_purge_expired():
+    """Purge expired challenges at most once every ``PURGE_INTERVAL`` seconds."""
+    global _next_purge
+    now = time.monotonic()
+    if now < _next_purge or not _purge_lock.acquire(blocking=False):
+        return 0
+    try:
+        _next_purge = now + PURGE_INTERVAL
+        return purge_expired()
+    finally:
+        _purge_lock.release()
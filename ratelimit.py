@@ -0,0 +1,213 @@
+"""Token-bucket rate limiting for the OTP endpoints.
+
+Views opt in with ``@limiter.limit(...)``. The check runs in a
+``before_request`` hook registered ahead of the app's own hooks, so a
+rejected request costs no database query and no SMS.
+
+Two backends are available, picked with ``RATELIMIT_BACKEND``:
+
+* ``memory`` (default): per-process buckets with heap-based expiry.
+* ``database``: buckets in the ``rate_limit_bucket`` table, shared by all
+  workers.
+"""
+import heapq
+import math
+import re
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app, request, session
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from bulk import conflict_insert
+from models import db, RateLimitBucket
+
+Rule = namedtuple('Rule', 'scope capacity refill_rate key_func methods')
+
+_RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*$')
+_UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Parse ``"3/10m"`` into ``(capacity, tokens_per_second)``."""
+    match = _RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate '{rate}'. Use e.g. '5/m' or '3/10m'.")
+    capacity = int(match.group(1))
+    period = int(match.group(2) or 1) * _UNIT_SECONDS[match.group(3)]
+    if capacity < 1:
+        raise ValueError(f"Invalid rate '{rate}': limit must be at least 1.")
+    return capacity, capacity / period
+
+
+def ip_key():
+    return request.remote_addr
+
+
+def phone_key():
+    return request.form.get('phone')
+
+
+def otp_challenge_key():
+    return session.get('otp_challenge_id')
+
+
+def _refill(tokens, updated_at, now, capacity, refill_rate):
+    return min(capacity, tokens + max(0.0, now - updated_at) * refill_rate)
+
+
+def _take(tokens, capacity, refill_rate, now):
+    """Spend one token; return ``(tokens, allowed, retry_after, expires_at)``."""
+    if tokens >= 1:
+        tokens -= 1
+        allowed, retry_after = True, 0.0
+    else:
+        allowed, retry_after = False, (1 - tokens) / refill_rate
+    # Once the bucket has refilled it is indistinguishable from a new one
+    expires_at = now + (capacity - tokens) / refill_rate
+    return tokens, allowed, retry_after, expires_at
+
+
+class MemoryBackend:
+    """Per-process buckets; idle buckets are dropped via a min-heap of expiry times."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._buckets = {}  # key -> [tokens, updated_at, expires_at]
+        self._expiry = []  # heap of (expires_at, key), may hold stale entries
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def hit(self, key, capacity, refill_rate):
+        now = self._clock()
+        with self._lock:
+            self._purge(now)
+            bucket = self._buckets.get(key)
+            tokens = capacity if bucket is None else _refill(bucket[0], bucket[1], now, capacity, refill_rate)
+            tokens, allowed, retry_after, expires_at = _take(tokens, capacity, refill_rate, now)
+            self._buckets[key] = [tokens, now, expires_at]
+            heapq.heappush(self._expiry, (expires_at, key))
+            if len(self._expiry) > 2 * len(self._buckets) + 64:
+                self._compact()
+        return allowed, retry_after
+
+    def _purge(self, now):
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(expiry)
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket[2] == expires_at:
+                del self._buckets[key]
+
+    def _compact(self):
+        self._expiry = [(bucket[2], key) for key, bucket in self._buckets.items()]
+        heapq.heapify(self._expiry)
+
+
+class DatabaseBackend:
+    """Buckets shared through the ``rate_limit_bucket`` table.
+
+    Each hit runs in its own short transaction on a separate connection, so
+    it never touches the request's ``db.session``.
+    """
+
+    def __init__(self, purge_interval=300, clock=time.time):
+        self._clock = clock
+        self._purge_interval = purge_interval
+        self._next_purge = 0.0
+
+    def hit(self, key, capacity, refill_rate):
+        now = self._clock()
+        table = RateLimitBucket.__table__
+        with db.engine.begin() as conn:
+            self._ensure_row(conn, key, capacity, now)
+            row = conn.execute(
+                select(table.c.tokens, table.c.updated_at)
+                .where(table.c.key == key)
+                .with_for_update()
+            ).one()
+            tokens = _refill(row.tokens, row.updated_at, now, capacity, refill_rate)
+            tokens, allowed, retry_after, expires_at = _take(tokens, capacity, refill_rate, now)
+            conn.execute(
+                update(table)
+                .where(table.c.key == key)
+                .values(tokens=tokens, updated_at=now, expires_at=expires_at)
+            )
+            if now >= self._next_purge:
+                self._next_purge = now + self._purge_interval
+                conn.execute(delete(table).where(table.c.expires_at <= now))
+        return allowed, retry_after
+
+    @staticmethod
+    def _ensure_row(conn, key, capacity, now):
+        table = RateLimitBucket.__table__
+        values = dict(key=key, tokens=capacity, updated_at=now, expires_at=now)
+        stmt = conflict_insert(table, conn.dialect.name)
+        if stmt is not None:
+            conn.execute(stmt.values(**values).on_conflict_do_nothing(index_elements=['key']))
+            return
+        if conn.execute(select(table.c.key).where(table.c.key == key)).first() is None:
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(table).values(**values))
+            except IntegrityError:
+                pass
+
+
+class Limiter:
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_BACKEND', 'memory')
+        if app.config['RATELIMIT_BACKEND'] == 'database':
+            self.backend = DatabaseBackend()
+        elif app.config['RATELIMIT_BACKEND'] == 'memory':
+            self.backend = MemoryBackend()
+        else:
+            raise ValueError(f"Unknown RATELIMIT_BACKEND '{app.config['RATELIMIT_BACKEND']}'.")
+        app.extensions['limiter'] = self
+        # Registered before the app's own hooks so rejected requests skip all DB work
+        app.before_request(self._check_request)
+
+    def limit(self, scope, rate, key=ip_key, methods=('POST',)):
+        """Allow ``rate`` requests per key within ``scope``.
+
+        Views that share a ``scope`` share buckets, e.g. sending and resending
+        OTPs from the same IP.
+        """
+        capacity, refill_rate = parse_rate(rate)
+        rule = Rule(scope, capacity, refill_rate, key, frozenset(methods))
+
+        def decorator(f):
+            f._rate_limits = getattr(f, '_rate_limits', ()) + (rule,)
+            return f
+        return decorator
+
+    def _check_request(self):
+        if not current_app.config['RATELIMIT_ENABLED']:
+            return None
+        view = current_app.view_functions.get(request.endpoint)
+        for rule in getattr(view, '_rate_limits', ()):
+            if request.method not in rule.methods:
+                continue
+            key = rule.key_func()
+            if not key:
+                continue
+            allowed, retry_after = self.backend.hit(f"{rule.scope}:{key}", rule.capacity, rule.refill_rate)
+            if not allowed:
+                retry_after = max(1, math.ceil(retry_after))
+                return (
+                    f"Too many requests. Please try again in {retry_after} seconds.",
+                    429,
+                    {'Retry-After': str(retry_after), 'Content-Type': 'text/plain; charset=utf-8'}
+                )
+        return None
+
+
+limiter = Limiter()
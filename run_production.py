@@ -1,31 +1,55 @@
+import logging
 import os
+import threading
 from waitress import serve
-from app import app, db
-from flask_migrate import upgrade
+from app import app, db, init_migrate
+from runtime import runtime
 from sqlalchemy.exc import OperationalError
 
 # Optional: Only for local SQLite fallback
 DB_PATH = os.path.join(os.path.dirname(__file__), 'baba_milk.db')
 
-if __name__ == "__main__":
-    print("📦 Running database migrations on startup...")
+log = logging.getLogger('baba.startup')
+
+
+def prepare_database():
+    log.info("Running database migrations in the background")
 
     with app.app_context():
         try:
             # If using SQLite and DB file not found (local dev)
             if 'sqlite' in app.config['SQLALCHEMY_DATABASE_URI'] and not os.path.exists(DB_PATH):
-                print("⚠️ No SQLite DB found. Creating tables locally...")
+                log.warning("No SQLite DB found, creating tables locally")
                 db.create_all()
             else:
                 # Run migrations (works for PostgreSQL on Render)
+                from flask_migrate import upgrade
+                init_migrate(app)
                 upgrade()
-            print("✅ Database ready.")
+            log.info("Database ready")
         except OperationalError as oe:
-            print("⚠️ OperationalError during upgrade:", oe)
-            print("⛑️ Trying db.create_all() as fallback...")
+            log.warning("OperationalError during upgrade, falling back to db.create_all()", extra={'error': str(oe)})
             db.create_all()
-        except Exception as e:
-            print("❌ Migration failed:", e)
+        except Exception:
+            log.exception("Migration failed")
+        finally:
+            # /readyz reports not ready until migrations have finished (successfully or not)
+            runtime.startup_done.set()
+
+
+def start_migrations():
+    runtime.startup_done.clear()
+    threading.Thread(target=prepare_database, name="db-migrations", daemon=True).start()
 
-    print("🚀 Launching Baba Milk Delivery with Waitress on port 10000...")
-    serve(app, host="0.0.0.0", port=10000)
+
+# Started on import, not only under __main__: render.yaml (gunicorn) and the Procfile (waitress-serve)
+# load `run_production:app`. The server listens straight away, so /healthz passes while this runs.
+if os.environ.get("RUN_MIGRATIONS_ON_STARTUP", "1") == "1":
+    start_migrations()
+
+
+if __name__ == "__main__":
+    # Live order streams (/events/orders) each hold a thread while open
+    threads = app.config['WORKER_THREADS']
+    log.info("Launching Baba Milk Delivery with Waitress", extra={'port': 10000, 'threads': threads})
+    serve(app, host="0.0.0.0", port=10000, threads=threads)
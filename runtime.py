@@ -0,0 +1,206 @@
+"""Liveness, readiness and runtime introspection for the production server.
+
+``/healthz`` only proves the process answers. ``/readyz`` runs the checks
+in ``READYZ_CHECKS`` (startup migrations finished, database ping, schema at
+the newest migration, SMS configured). ``/debug/runtime`` reports counters
+that are already kept in memory, so it is cheap enough to poll;
+``tracemalloc`` snapshots are only taken when asked for.
+"""
+import glob
+import os
+import re
+import threading
+import time
+import tracemalloc
+
+from flask import current_app, g
+from sqlalchemy import text
+
+import catalog
+import sms
+from models import db
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations', 'versions')
+REVISION_PATTERN = re.compile(r"^(revision|down_revision)\s*=\s*['\"]?([0-9a-f]+|None)['\"]?", re.MULTILINE)
+TRACEMALLOC_FRAMES = 10
+
+
+def migration_heads(directory=MIGRATIONS_DIR):
+    """Head revisions read straight from the migration scripts, without importing Alembic."""
+    revisions, parents = set(), set()
+    for path in glob.glob(os.path.join(directory, '*.py')):
+        with open(path) as f:
+            found = dict(REVISION_PATTERN.findall(f.read()))
+        if 'revision' in found:
+            revisions.add(found['revision'])
+            if found.get('down_revision') not in (None, 'None'):
+                parents.add(found['down_revision'])
+    return revisions - parents
+
+
+def current_rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        # Peak rather than current RSS, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _ratio(hits, misses):
+    total = hits + misses
+    return round(hits / total, 3) if total else None
+
+
+class Runtime:
+    def __init__(self):
+        self.started = time.time()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._heads = None
+        # Cleared by run_production.py while it migrates in the background
+        self.startup_done = threading.Event()
+        self.startup_done.set()
+
+    def init_app(self, app):
+        app.config.setdefault('WORKER_THREADS', 16)
+        app.config.setdefault('READYZ_CHECKS', ('startup', 'database', 'migrations', 'sms'))
+        app.extensions['runtime'] = self
+        app.before_request(self._request_started)
+        app.teardown_request(self._request_finished)
+
+    def _request_started(self):
+        g.runtime_counted = True
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _request_finished(self, exc):
+        # Teardown also runs for contexts that never dispatched (test helpers, CLI)
+        if not g.pop('runtime_counted', False):
+            return
+        with self._lock:
+            self.in_flight -= 1
+
+    # Readiness
+
+    def check_startup(self):
+        if self.startup_done.is_set():
+            return True, 'done'
+        return False, 'startup migrations still running'
+
+    def check_database(self):
+        with db.engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+        return True, 'reachable'
+
+    def check_migrations(self):
+        if self._heads is None:
+            self._heads = migration_heads()
+        with db.engine.connect() as conn:
+            try:
+                current = set(conn.execute(text('SELECT version_num FROM alembic_version')).scalars())
+            except Exception:
+                return False, 'no alembic_version table'
+        if current == self._heads:
+            return True, ','.join(sorted(current))
+        return False, f"at {','.join(sorted(current)) or 'nothing'}, head is {','.join(sorted(self._heads))}"
+
+    def check_sms(self):
+        if sms.is_configured():
+            return True, 'configured'
+        return False, 'Twilio credentials missing'
+
+    def readiness(self):
+        checks = {}
+        for name in current_app.config['READYZ_CHECKS']:
+            try:
+                ok, detail = getattr(self, f'check_{name}')()
+            except Exception as e:
+                ok, detail = False, f'{type(e).__name__}: {e}'
+            checks[name] = {'ok': ok, 'detail': detail}
+        return all(check['ok'] for check in checks.values()), checks
+
+    # Introspection
+
+    def database_pools(self):
+        pools = {}
+        for bind, engine in db.engines.items():
+            pool = engine.pool
+            stats = {'class': type(pool).__name__}
+            for name in ('size', 'checkedout', 'checkedin', 'overflow'):
+                method = getattr(pool, name, None)
+                if method is not None:
+                    stats[name] = method()
+            pools[bind or 'primary'] = stats
+        return pools
+
+    def report(self, tracemalloc_action=None):
+        extensions = current_app.extensions
+        threads = current_app.config['WORKER_THREADS']
+        order_events = extensions.get('order_events')
+        # A streaming response leaves in_flight once returned, but keeps its worker thread until closed
+        open_streams = order_events.open_streams if order_events is not None else 0
+        busy = self.in_flight + open_streams
+        report = {
+            'uptime_seconds': round(time.time() - self.started),
+            'requests': {'in_flight': self.in_flight, 'peak_in_flight': self.peak_in_flight, 'total': self.requests},
+            'threads': {
+                'worker_threads': threads,
+                'busy': busy,
+                'utilization': round(busy / threads, 3) if threads else None,
+                'python_threads': threading.active_count(),
+            },
+            'database_pools': self.database_pools(),
+            'caches': {},
+            'memory': {'rss_bytes': current_rss_bytes()},
+        }
+
+        compress = extensions.get('compress')
+        if compress is not None and compress.cache is not None:
+            cache = compress.cache
+            report['caches']['compressed_bodies'] = {
+                'hits': cache.hits, 'misses': cache.misses, 'hit_ratio': _ratio(cache.hits, cache.misses),
+                'bytes': cache.size, 'max_bytes': cache.max_bytes,
+            }
+        stats = catalog.index_stats
+        report['caches']['catalog_index'] = {
+            'hits': stats['hits'], 'rebuilds': stats['rebuilds'], 'hit_ratio': _ratio(stats['hits'], stats['rebuilds']),
+        }
+        if order_events is not None and order_events.backend is not None:
+            report['order_streams'] = {
+                'open': open_streams,
+                'max': current_app.config['SSE_MAX_STREAMS'],
+                'subscribers': order_events.backend.subscriber_count(),
+            }
+        limiter = extensions.get('limiter')
+        if limiter is not None and hasattr(limiter.backend, '__len__'):
+            report['caches']['rate_limit_buckets'] = {'entries': len(limiter.backend)}
+
+        report['memory']['tracemalloc'] = self.tracemalloc(tracemalloc_action)
+        return report
+
+    def tracemalloc(self, action=None):
+        """``start``/``stop`` tracing, or ``snapshot`` the top allocators while it runs."""
+        if action == 'start' and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        elif action == 'stop' and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if not tracemalloc.is_tracing():
+            return {'tracing': False}
+        current, peak = tracemalloc.get_traced_memory()
+        result = {'tracing': True, 'traced_bytes': current, 'traced_peak_bytes': peak}
+        if action == 'snapshot':
+            top = tracemalloc.take_snapshot().statistics('lineno')[:TRACEMALLOC_FRAMES]
+            result['top'] = [
+                {'where': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}', 'bytes': stat.size, 'count': stat.count}
+                for stat in top
+            ]
+        return result
+
+
+runtime = Runtime()
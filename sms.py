@@ -0,0 +1,54 @@
+"""Lazy Twilio SMS client.
+
+twilio.rest pulls in a large HTTP stack, so it is only imported the first
+time a message is actually sent.
+"""
+import os
+import threading
+
+from flask import current_app
+
+_client_lock = threading.Lock()
+
+
+class SMSError(Exception):
+    """Raised when the SMS provider rejects a message."""
+
+
+def init_app(app):
+    app.config.setdefault('TWILIO_ACCOUNT_SID', os.environ.get("TWILIO_ACCOUNT_SID"))
+    app.config.setdefault('TWILIO_AUTH_TOKEN', os.environ.get("TWILIO_AUTH_TOKEN"))
+    app.config.setdefault('TWILIO_PHONE_NUMBER', os.environ.get("TWILIO_PHONE_NUMBER"))
+    app.extensions['sms_client'] = None
+
+
+def is_configured(app=None):
+    config = (app or current_app).config
+    return bool(config.get('TWILIO_ACCOUNT_SID') and config.get('TWILIO_AUTH_TOKEN') and config.get('TWILIO_PHONE_NUMBER'))
+
+
+def get_client():
+    app = current_app._get_current_object()
+    client = app.extensions.get('sms_client')
+    if client is None:
+        with _client_lock:
+            client = app.extensions.get('sms_client')
+            if client is None:
+                from twilio.rest import Client
+                client = Client(app.config['TWILIO_ACCOUNT_SID'], app.config['TWILIO_AUTH_TOKEN'])
+                app.extensions['sms_client'] = client
+    return client
+
+
+def send_sms(to, body):
+    """Send ``body`` to ``to`` and return the provider message SID."""
+    from twilio.base.exceptions import TwilioRestException
+    try:
+        message = get_client().messages.create(
+            to=to,
+            from_=current_app.config['TWILIO_PHONE_NUMBER'],
+            body=body
+        )
+    except TwilioRestException as e:
+        raise SMSError(str(e)) from e
+    return message.sid
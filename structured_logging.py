@@ -0,0 +1,183 @@
+"""JSON logging that stays off the request path.
+
+Request threads only put records on an in-memory queue (``QueueHandler``);
+a ``QueueListener`` thread formats them as one JSON object per line and
+writes them to stdout. On the way in each record gets the current request
+id, phone numbers are masked in every text field and traceback, OTP codes
+are removed, and DEBUG records can be sampled so high-volume lines stay
+affordable.
+
+    log = logging.getLogger('baba.orders')
+    log.info("order placed", extra={'order_id': order.id, 'phone': phone})
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+LOGGER_NAME = 'baba'
+REQUEST_ID_HEADER = 'X-Request-ID'
+REDACTED = '[redacted]'
+
+# Extra fields whose values are secrets and never logged
+SECRET_FIELDS = frozenset(('otp', 'code', 'password', 'session'))
+# Extra fields holding phone numbers, logged masked
+PHONE_FIELDS = frozenset(('phone', 'to', 'delivery_phone'))
+PHONE_PATTERN = re.compile(r'\+?\d{9,15}')
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+def mask_phone(value):
+    return PHONE_PATTERN.sub(lambda m: '*' * (len(m.group()) - 2) + m.group()[-2:], str(value))
+
+
+def extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class RedactingFilter(logging.Filter):
+    def filter(self, record):
+        for key, value in extra_fields(record).items():
+            if key in SECRET_FIELDS:
+                setattr(record, key, REDACTED)
+            # Free text such as Twilio error messages can quote the number too
+            elif isinstance(value, str) or (key in PHONE_FIELDS and value is not None):
+                setattr(record, key, mask_phone(value))
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        record.msg = mask_phone(record.msg)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = mask_phone(record.exc_text)
+        if record.stack_info:
+            record.stack_info = mask_phone(record.stack_info)
+        return True
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only ``rate`` of the records at DEBUG level or below."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        entry.update(extra_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Keep extra fields as data for the JSON formatter; only render the traceback here
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class StructuredLogging:
+    def __init__(self):
+        self.listener = None
+        self.handler = None
+        atexit.register(self.stop)
+
+    def init_app(self, app, stream=None):
+        app.config.setdefault('LOG_LEVEL', 'INFO')
+        app.config.setdefault('LOG_DEBUG_SAMPLE_RATE', 0.1)
+        app.config.setdefault('LOG_QUEUE', True)
+        app.extensions['structured_logging'] = self
+        if self.handler is None:
+            self.configure(app.config['LOG_LEVEL'], app.config['LOG_DEBUG_SAMPLE_RATE'],
+                           use_queue=app.config['LOG_QUEUE'], stream=stream)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def configure(self, level, sample_rate, use_queue=True, stream=None):
+        """(Re)build the handler on the ``baba`` logger."""
+        logger = logging.getLogger(LOGGER_NAME)
+        self.stop()
+        if self.handler is not None:
+            logger.removeHandler(self.handler)
+        logger.setLevel(level)
+        logger.propagate = False
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+        if use_queue:
+            self.handler = _QueueHandler(queue.SimpleQueue())
+            self.listener = QueueListener(self.handler.queue, output)
+            self.listener.start()
+        else:
+            self.handler = output
+        for log_filter in (SamplingFilter(sample_rate), RequestIdFilter(), RedactingFilter()):
+            self.handler.addFilter(log_filter)
+        logger.addHandler(self.handler)
+
+    def stop(self):
+        """Flush queued records and stop the listener thread."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def _start_request(self):
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex[:16]
+        g.request_started = time.perf_counter()
+
+    def _finish_request(self, response):
+        if 'request_id' in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        log = logging.getLogger(f'{LOGGER_NAME}.request')
+        if log.isEnabledFor(logging.DEBUG) and 'request_started' in g:
+            log.debug("request", extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - g.request_started) * 1000, 2),
+            })
+        return response
+
+
+structured_logging = StructuredLogging()
@@ -0,0 +1,151 @@
+"""Synthetic users, orders and carts for load and query-plan testing.
+
+Volumes follow rough production shapes rather than uniform noise: a few
+customers place most orders (Pareto), a handful of products dominate sales
+(Zipf), orders bunch in the morning delivery window and old orders are
+mostly delivered or cancelled while recent ones are still in progress.
+
+Rows are bulk-inserted in chunks with ``INSERT ... RETURNING`` so the same
+code runs on SQLite and PostgreSQL.
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
+
+from bulk import chunks
+from models import (
+    db, User, Product, CartItem, Order, OrderItem, TRACKER_STATUSES, format_items_summary
+)
+
+DEFAULT_CHUNK_SIZE = 1000
+# Synthetic customers get phones in this range so they never collide with real sign-ups
+PHONE_PREFIX = '+2517'
+
+FIRST_NAMES = ('Abebe', 'Almaz', 'Bekele', 'Dawit', 'Eden', 'Hana', 'Kebede', 'Liya', 'Meron', 'Mulu',
+               'Naod', 'Rahel', 'Selam', 'Tigist', 'Yonas', 'Zewdu')
+LAST_NAMES = ('Alemu', 'Bekele', 'Desta', 'Gebre', 'Haile', 'Kassa', 'Mengistu', 'Tadesse', 'Tesfaye', 'Wolde')
+SUBCITIES = ('Bole', 'Yeka', 'Kirkos', 'Arada', 'Lideta', 'Gulele', 'Kolfe Keranio', 'Nifas Silk-Lafto',
+             'Akaky Kaliti', 'Addis Ketema')
+PAYMENT_METHODS = (('cash_on_delivery', 0.6), ('telebirr', 0.3), ('cbebirr', 0.1))
+
+
+def _insert_returning_ids(model, rows, chunk_size):
+    ids = []
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+    for chunk in chunks(rows, chunk_size):
+        ids.extend(db.session.execute(stmt, chunk).scalars().all())
+    return ids
+
+
+def _order_status(rng, age_days, payment_method):
+    if age_days > 3:
+        return 'cancelled' if rng.random() < 0.06 else 'delivered'
+    if payment_method != 'cash_on_delivery' and rng.random() < 0.3:
+        return f'pending_payment_{payment_method}'
+    # Younger orders are further from delivery
+    progress = min(1.0, age_days / 3 + rng.random() * 0.4)
+    return TRACKER_STATUSES[min(len(TRACKER_STATUSES) - 1, int(progress * len(TRACKER_STATUSES)))]
+
+
+def _order_date(rng, now, days):
+    while True:
+        day = int(rng.random() ** 1.5 * days)  # recent days are busier
+        hour = int(rng.gauss(9, 2.5))  # morning delivery window
+        if not 6 <= hour <= 21:
+            continue
+        order_date = (now - timedelta(days=day)).replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+        # Later today has not happened yet; draw again rather than pile orders up at `now`
+        if order_date <= now:
+            return order_date
+
+
+def generate(users=1000, mean_orders=8, days=365, cart_share=0.3, seed=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Insert ``users`` customers with their orders, order items and saved carts.
+
+    Returns a dict with the number of rows inserted per table.
+    """
+    rng = random.Random(seed)
+    products = Product.query.order_by(Product.id).all()
+    if not products:
+        raise ValueError("The product table is empty; run `flask init-db` or `flask sync-catalog` first.")
+    # Zipf-like popularity over a shuffled catalog
+    popular = products[:]
+    rng.shuffle(popular)
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(popular))]
+
+    offset = User.query.filter(User.phone.like(f'{PHONE_PREFIX}%')).count()
+    # Every synthetic user shares one password hash; logins are OTP-only anyway
+    password = generate_password_hash(f'synthetic-{rng.random()}')
+    user_rows = [
+        {
+            'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            'phone': f"{PHONE_PREFIX}{offset + i:08d}",
+            'password': password,
+            'is_admin': False,
+            'address': f"{rng.choice(SUBCITIES)}, Addis Ababa",
+        }
+        for i in range(users)
+    ]
+    user_ids = _insert_returning_ids(User, user_rows, chunk_size)
+
+    now = datetime.utcnow()
+    methods, method_weights = zip(*PAYMENT_METHODS)
+    order_rows, order_lines = [], []
+    # Pareto with alpha 1.16 is the 80/20 shape; scale it so the average is mean_orders
+    activity = [min(rng.paretovariate(1.16), 200.0) for _ in user_ids]
+    scale = mean_orders * len(activity) / sum(activity) if activity else 0
+    for user_id, user, weight in zip(user_ids, user_rows, activity):
+        # Randomized rounding keeps the average at mean_orders
+        for _ in range(int(weight * scale + rng.random())):
+            method = rng.choices(methods, method_weights)[0]
+            order_date = _order_date(rng, now, days)
+            line_count = min(len(popular), max(1, int(rng.expovariate(1 / 2.2)) + 1))
+            lines = []
+            for product in dict.fromkeys(rng.choices(popular, weights, k=line_count)):
+                lines.append((product, rng.choices((1, 2, 3, 4), (0.6, 0.25, 0.1, 0.05))[0]))
+            order_rows.append({
+                'user_id': user_id,
+                'order_date': order_date,
+                'total_amount': round(sum(product.price * quantity for product, quantity in lines), 2),
+                'delivery_address': user['address'],
+                'delivery_phone': user['phone'],
+                'payment_method': method,
+                'payment_details': {'phone': user['phone']} if method != 'cash_on_delivery' else {},
+                'status': _order_status(rng, (now - order_date).days, method),
+                'items_summary': format_items_summary((product.name, quantity) for product, quantity in lines),
+            })
+            order_lines.append(lines)
+    order_ids = _insert_returning_ids(Order, order_rows, chunk_size)
+
+    item_rows = [
+        {
+            'order_id': order_id,
+            'product_id': product.id,
+            'product_name': product.name,
+            'quantity': quantity,
+            'price_at_purchase': product.price,
+        }
+        for order_id, lines in zip(order_ids, order_lines)
+        for product, quantity in lines
+    ]
+    for chunk in chunks(item_rows, chunk_size):
+        db.session.execute(insert(OrderItem), chunk)
+
+    cart_rows = []
+    for user_id in user_ids:
+        if rng.random() < cart_share:
+            for product in dict.fromkeys(rng.choices(popular, weights, k=rng.randint(1, 5))):
+                cart_rows.append({'user_id': user_id, 'product_id': product.id, 'quantity': rng.randint(1, 3)})
+    for chunk in chunks(cart_rows, chunk_size):
+        db.session.execute(insert(CartItem), chunk)
+
+    db.session.commit()
+    return {'users': len(user_ids), 'orders': len(order_ids), 'order_items': len(item_rows), 'cart_items': len(cart_rows)}
+
+
+def analyze():
+    """Refresh planner statistics so EXPLAIN reflects the new volumes."""
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()